@@ -8,16 +8,16 @@ import os
 import subprocess
 import json
 from datetime import datetime
+from buffered_log import get_logger
 
 WORKSPACE = "C:/Users/殇/.openclaw/workspace"
 LOG_FILE = "C:/Users/殇/.openclaw/workspace/auto_backup.log"
 MAX_BACKUPS = 7  # 保留最近 7 个备份分支
 
 def log(message):
-    """记录日志"""
+    """记录日志 (写入缓冲，由后台线程刷盘，退出时自动写完)"""
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(f"[{timestamp}] {message}\n")
+    get_logger(LOG_FILE, "auto_backup").log(message)
     print(f"[{timestamp}] {message}")
 
 def run_git(cmd, cwd=WORKSPACE):
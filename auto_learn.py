@@ -5,23 +5,69 @@
 """
 
 import os
+import re
+import sys
+import time
+import array
+import hashlib
+import functools
+import random
 import subprocess
 import json
+import threading
+import http.client
 import urllib.request
 import urllib.error
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
+from buffered_log import get_logger
 from pathlib import Path
-from urllib.parse import quote
+from urllib.parse import urlsplit
 
 WORKSPACE = "C:/Users/殇/.openclaw/workspace"
+# 为 None 时日志只打印不落盘 (替身 / 基准模式)
 LOG_FILE = f"{WORKSPACE}/memory/learning.log"
 DISCOVERED_FILE = f"{WORKSPACE}/memory/discovered-skills.jsonl"
 
+# 各平台 API 地址 (测试时换成本地替身服务器)
+API_BASES = {
+    "ClawHub": "https://clawhub.com",
+    "GitHub": "https://api.github.com",
+    "Moltbook": "https://www.moltbook.com",
+}
+# 单个请求超时 (秒)、整次扫描的截止时间 (秒，到点后只保留已完成的来源)
+SOURCE_TIMEOUTS = {"ClawHub": 10, "GitHub": 15, "Moltbook": 10}
+SCAN_DEADLINE = 30
+USER_AGENT = "OpenClaw-AutoLearn/1.0"
+
+# GitHub 搜索：响应缓存 (ETag + 配额状态)、每页条数、每个查询最多翻几页、
+# 配额用完时最多等多久重置 (秒，更久就改用缓存)、缓存保留的响应数
+GITHUB_CACHE = f"{WORKSPACE}/memory/github_search_cache.json"
+GITHUB_PER_PAGE = 10
+GITHUB_MAX_PAGES = 2
+GITHUB_MAX_WAIT = 10
+GITHUB_CACHE_KEEP = 200
+
+# 去重：链接相同即同一项目；否则标题、描述分别切成字符 NEAR_DUP_SHINGLE-gram 做
+# NEAR_DUP_PERMS 个哈希的 MinHash 签名，标题签名分 NEAR_DUP_BANDS 段做 LSH 分桶找候选。
+# 候选的标题数字必须相同，且 (双方都有描述时) 标题估计 Jaccard >= NEAR_DUP_TITLE_THRESHOLD、
+# 描述 >= NEAR_DUP_DESC_THRESHOLD，(缺描述时) 标题 >= NEAR_DUP_TITLE_ONLY_THRESHOLD 才算近似重复。
+# 已保存发现的索引记录追加在 NEAR_DUP_INDEX (二进制，布局见 RECORD_*)，改参数后要删掉重建
+NEAR_DUP_INDEX = f"{WORKSPACE}/memory/discovered-dedup.bin"
+NEAR_DUP_SHINGLE = 3
+NEAR_DUP_PERMS = 64
+NEAR_DUP_BANDS = 16
+NEAR_DUP_TITLE_THRESHOLD = 0.6
+NEAR_DUP_DESC_THRESHOLD = 0.7
+NEAR_DUP_TITLE_ONLY_THRESHOLD = 0.9
+# 标题末尾的这些词不影响是否同一项目 (awesome-agent-fork 即 awesome-agent)
+TITLE_COPY_SUFFIXES = ("fork", "forked", "copy", "clone", "mirror")
+
 def log(message):
-    """记录日志"""
+    """记录日志 (写入缓冲，由后台线程刷盘，退出时自动写完)"""
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(f"[{timestamp}] {message}\n")
+    if LOG_FILE:
+        get_logger(LOG_FILE, "auto_learn").log(message)
     print(f"[{timestamp}] {message}")
 
 def run_git(cmd, cwd=WORKSPACE):
@@ -34,18 +80,118 @@ def run_git(cmd, cwd=WORKSPACE):
     except Exception as e:
         return -1, "", str(e)
 
+# ============ 0. 网络：连接池与截止时间 ============
+class ScanDeadline(Exception):
+    """超过整次扫描的截止时间"""
+
+
+class ConnectionPool:
+    """按 (协议, 主机, 端口) 复用 keep-alive 连接，线程安全
+
+    同一主机的多次请求 (例如 GitHub 的几个查询) 不再各自握手 TLS。
+    空闲连接被服务端关掉时自动换新连接重试一次。
+    """
+    
+    def __init__(self, max_idle_per_host=4):
+        self.max_idle_per_host = max_idle_per_host
+        self._idle = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+    
+    def _take(self, key, timeout):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.reused += 1
+                conn = idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+            self.created += 1
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(host, port, timeout=timeout), False
+    
+    def _give(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+    
+    def get(self, url, headers=None, timeout=10):
+        """GET url，返回 (状态码, 响应头, 响应体字节)"""
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        request_headers = {"User-Agent": USER_AGENT, **(headers or {})}
+        
+        for attempt in range(2):
+            conn, reused = self._take(key, timeout)
+            try:
+                conn.request("GET", path, headers=request_headers)
+                resp = conn.getresponse()
+                body = resp.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            if resp.will_close:
+                conn.close()
+            else:
+                self._give(key, conn)
+            return resp.status, resp.headers, body
+    
+    def close(self):
+        with self._lock:
+            conns = [c for idle in self._idle.values() for c in idle]
+            self._idle.clear()
+        for conn in conns:
+            conn.close()
+
+
+POOL = ConnectionPool()
+
+
+def request_timeout(timeout, deadline):
+    """单个请求的超时：不超过到截止时间 (monotonic) 的剩余时间"""
+    if deadline is None:
+        return timeout
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise ScanDeadline("已超过扫描截止时间")
+    return min(timeout, remaining)
+
+
+def fetch_json(url, headers=None, timeout=10, deadline=None, pool=None, stats=None):
+    """GET 并解析 JSON，HTTP 错误抛出 HTTPError"""
+    status, resp_headers, body = (pool or POOL).get(url, headers, request_timeout(timeout, deadline))
+    if stats is not None:
+        stats["requests"] = stats.get("requests", 0) + 1
+        stats["bytes"] = stats.get("bytes", 0) + len(body)
+    if status >= 400:
+        raise urllib.error.HTTPError(url, status, body[:200].decode(errors="replace"), resp_headers, None)
+    return json.loads(body.decode())
+
+
 # ============ 1. 扫描 ClawHub ============
-def scan_clawhub():
+def scan_clawhub(pool=None, deadline=None, base=None, stats=None):
     """扫描 ClawHub 技能市场"""
     log("🔍 扫描 ClawHub...")
     skills = []
+    stats = stats if stats is not None else {}
     
     try:
         # ClawHub API - 获取热门技能
-        url = "https://clawhub.com/api/skills?sort=popular&limit=20"
-        req = urllib.request.Request(url)
-        resp = urllib.request.urlopen(req, timeout=10)
-        data = json.loads(resp.read().decode())
+        url = f"{base or API_BASES['ClawHub']}/api/skills?sort=popular&limit=20"
+        data = fetch_json(url, timeout=SOURCE_TIMEOUTS["ClawHub"], deadline=deadline, pool=pool, stats=stats)
         
         for item in data.get("skills", []):
             skills.append({
@@ -58,21 +204,187 @@ def scan_clawhub():
             })
         
         log(f"   ClawHub: 发现 {len(skills)} 个技能")
+        stats["status"] = "ok"
     except Exception as e:
         log(f"   ClawHub 扫描失败: {e}")
+        stats["status"] = "error"
     
     return skills
 
 # ============ 2. 扫描 GitHub ============
-def scan_github():
-    """扫描 GitHub 搜索高质量项目"""
+class RateLimited(Exception):
+    """GitHub 配额已用完，且在截止时间内等不到重置"""
+
+
+def next_link(link_header):
+    """从 Link 响应头取 rel="next" 的地址"""
+    for part in (link_header or "").split(","):
+        section = part.split(";")
+        if len(section) > 1 and 'rel="next"' in section[1]:
+            return section[0].strip().strip("<>")
+    return None
+
+
+class GitHubSearchClient:
+    """按配额调度的 GitHub 搜索客户端
+
+    - 每个请求地址缓存 ETag 和 (精简后的) 结果，再次请求带 If-None-Match，
+      304 直接用缓存，不消耗配额
+    - 记录 X-RateLimit-Remaining / X-RateLimit-Reset (连同缓存一起持久化)，
+      配额用完时：重置时间在 GITHUB_MAX_WAIT 秒内且不超过截止时间就等到重置，
+      否则不发请求，直接用缓存 (没有缓存则跳过)，不再白白等超时
+    - search_all 按广度优先翻页：先拿每个查询的第一页，配额还有余才翻后面的页
+    """
+    
+    def __init__(self, pool=None, base=None, token=None, cache_file=None, deadline=None, stats=None):
+        self.pool = pool or POOL
+        self.base = base or API_BASES["GitHub"]
+        self.token = token if token is not None else os.environ.get("GITHUB_TOKEN", "")
+        self.cache_file = cache_file or GITHUB_CACHE
+        self.deadline = deadline
+        self.stats = stats if stats is not None else {}
+        cache = self._load()
+        self.rate = cache.get("rate", {})
+        self.responses = cache.get("responses", {})
+    
+    def _load(self):
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+    
+    def save(self):
+        """写回缓存，只保留最近用过的 GITHUB_CACHE_KEEP 个响应"""
+        recent = sorted(self.responses.items(), key=lambda x: x[1].get("at", 0), reverse=True)
+        data = {"rate": self.rate, "responses": dict(recent[:GITHUB_CACHE_KEEP])}
+        Path(self.cache_file).parent.mkdir(parents=True, exist_ok=True)
+        tmp = f"{self.cache_file}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.cache_file)
+    
+    def _count(self, key):
+        self.stats[key] = self.stats.get(key, 0) + 1
+    
+    def remaining(self):
+        """当前剩余配额；不知道或已过重置时间时返回 None"""
+        if "remaining" not in self.rate or time.time() >= self.rate.get("reset", 0):
+            return None
+        return self.rate["remaining"]
+    
+    def _update_rate(self, headers):
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is not None and reset is not None:
+            self.rate = {"remaining": int(remaining), "reset": int(reset),
+                         "limit": int(headers.get("X-RateLimit-Limit", 0))}
+        retry_after = headers.get("Retry-After")
+        if retry_after is not None:
+            # 次级限流：在 Retry-After 秒内不再请求
+            self.rate = dict(self.rate, remaining=0, reset=int(time.time() + int(retry_after)))
+        self.stats["rate_remaining"] = self.rate.get("remaining")
+    
+    def _wait_for_quota(self):
+        """配额为 0 时等到重置 (等得起的话)，返回是否可以发请求"""
+        if self.remaining() != 0:
+            return True
+        wait_seconds = self.rate["reset"] - time.time() + 1
+        budget = GITHUB_MAX_WAIT
+        if self.deadline is not None:
+            budget = min(budget, self.deadline - time.monotonic() - 1)
+        if wait_seconds > budget:
+            return False
+        log(f"   GitHub 配额已用完，等待 {wait_seconds:.0f} 秒重置")
+        time.sleep(max(0, wait_seconds))
+        self.rate = {}
+        return True
+    
+    def get(self, url):
+        """请求一页搜索结果，返回 (结果, 来源)；来源为 network / 304 / stale (配额不足时的旧缓存)"""
+        cached = self.responses.get(url)
+        if not self._wait_for_quota():
+            if cached:
+                self._count("stale")
+                return cached, "stale"
+            raise RateLimited(f"配额已用完，{self.rate['reset'] - time.time():.0f} 秒后重置")
+        
+        headers = {"Accept": "application/vnd.github+json"}
+        if self.token:
+            headers["Authorization"] = f"token {self.token}"
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        status, resp_headers, body = self.pool.get(url, headers, request_timeout(SOURCE_TIMEOUTS["GitHub"], self.deadline))
+        self._count("requests")
+        self.stats["bytes"] = self.stats.get("bytes", 0) + len(body)
+        self._update_rate(resp_headers)
+        
+        if status == 304 and cached:
+            cached["at"] = time.time()
+            self._count("not_modified")
+            return cached, "304"
+        if status in (403, 429) and self.remaining() == 0:
+            if cached:
+                self._count("stale")
+                return cached, "stale"
+            raise RateLimited(f"配额已用完 (HTTP {status})")
+        if status >= 400:
+            raise urllib.error.HTTPError(url, status, body[:200].decode(errors="replace"), resp_headers, None)
+        
+        data = json.loads(body.decode())
+        # 只缓存用得到的字段
+        entry = {
+            "etag": resp_headers.get("ETag"),
+            "next": next_link(resp_headers.get("Link")),
+            "items": [{key: item.get(key) for key in ("name", "description", "html_url", "stargazers_count")}
+                      for item in data.get("items", [])],
+            "at": time.time()
+        }
+        self.responses[url] = entry
+        return entry, "network"
+    
+    def search_url(self, query):
+        return f"{self.base}/search/repositories?q={query}+stars:>10&sort=stars&per_page={GITHUB_PER_PAGE}"
+    
+    def search_all(self, queries, max_pages=GITHUB_MAX_PAGES):
+        """搜索多个查询，返回 {查询: 条目列表或 None (失败)}，翻页按广度优先"""
+        results = {query: [] for query in queries}
+        sources = {query: [] for query in queries}
+        next_urls = {query: self.search_url(query) for query in queries}
+        for _ in range(max_pages):
+            for query in queries:
+                url = next_urls.get(query)
+                if url is None or results[query] is None:
+                    continue
+                try:
+                    page, source = self.get(url)
+                except RateLimited as e:
+                    log(f"   GitHub ({query}) 跳过: {e}")
+                    next_urls[query] = None
+                    if not results[query]:
+                        results[query] = None
+                    continue
+                except Exception as e:
+                    log(f"   GitHub ({query}) 扫描失败: {e}")
+                    next_urls[query] = None
+                    if not results[query]:
+                        results[query] = None
+                    continue
+                results[query].extend(page["items"])
+                sources[query].append(source)
+                next_urls[query] = page.get("next")
+        for query, items in results.items():
+            if items is not None:
+                log(f"   GitHub ({query}): 发现 {len(items)} 个项目 ({'/'.join(sources[query])})")
+        return results
+
+
+def scan_github(pool=None, deadline=None, base=None, stats=None, cache_file=None):
+    """扫描 GitHub 搜索高质量项目 (按配额调度，条件请求复用缓存)"""
     log("🔍 扫描 GitHub...")
     skills = []
-    
-    github_token = os.environ.get("GITHUB_TOKEN", "")
-    headers = {}
-    if github_token:
-        headers["Authorization"] = f"token {github_token}"
+    stats = stats if stats is not None else {}
     
     # 搜索查询：OpenClaw 相关技能
     queries = [
@@ -82,42 +394,43 @@ def scan_github():
         ("open-source+automation", "oss"),
     ]
     
+    client = GitHubSearchClient(pool, base, deadline=deadline, stats=stats, cache_file=cache_file)
+    try:
+        results = client.search_all([query for query, _ in queries])
+    finally:
+        client.save()
+    
+    failed = 0
     for query, category in queries:
-        try:
-            url = f"https://api.github.com/search/repositories?q={query}+stars:>10&sort=stars&per_page=10"
-            req = urllib.request.Request(url, headers=headers)
-            resp = urllib.request.urlopen(req, timeout=15)
-            data = json.loads(resp.read().decode())
-            
-            for item in data.get("items", []):
-                skills.append({
-                    "title": item.get("name", ""),
-                    "description": item.get("description", ""),
-                    "source": "GitHub",
-                    "url": item.get("html_url", ""),
-                    "stars": item.get("stargazers_count", 0),
-                    "quality_score": min(item.get("stargazers_count", 0) / 1000, 1.0),
-                    "category": category
-                })
-            
-            log(f"   GitHub ({query}): 发现 {len(data.get('items', []))} 个项目")
-        except Exception as e:
-            log(f"   GitHub ({query}) 扫描失败: {e}")
+        items = results.get(query)
+        if items is None:
+            failed += 1
+            continue
+        for item in items:
+            skills.append({
+                "title": item.get("name", ""),
+                "description": item.get("description", ""),
+                "source": "GitHub",
+                "url": item.get("html_url", ""),
+                "stars": item.get("stargazers_count", 0),
+                "quality_score": min((item.get("stargazers_count") or 0) / 1000, 1.0),
+                "category": category
+            })
     
+    stats["status"] = "ok" if not failed else "error" if failed == len(queries) else "partial"
     return skills
 
 # ============ 3. 扫描 Moltbook ============
-def scan_moltbook():
+def scan_moltbook(pool=None, deadline=None, base=None, stats=None):
     """扫描 Moltbook AI 研究"""
     log("🔍 扫描 Moltbook...")
     papers = []
+    stats = stats if stats is not None else {}
     
     try:
         # Moltbook API - 获取最新论文
-        url = "https://www.moltbook.com/api/papers?sort=recent&limit=10"
-        req = urllib.request.Request(url)
-        resp = urllib.request.urlopen(req, timeout=10)
-        data = json.loads(resp.read().decode())
+        url = f"{base or API_BASES['Moltbook']}/api/papers?sort=recent&limit=10"
+        data = fetch_json(url, timeout=SOURCE_TIMEOUTS["Moltbook"], deadline=deadline, pool=pool, stats=stats)
         
         for item in data.get("papers", []):
             papers.append({
@@ -130,24 +443,280 @@ def scan_moltbook():
             })
         
         log(f"   Moltbook: 发现 {len(papers)} 篇论文")
+        stats["status"] = "ok"
     except Exception as e:
         log(f"   Moltbook 扫描失败: {e}")
+        stats["status"] = "error"
     
     return papers
 
+SCANNERS = {"ClawHub": scan_clawhub, "GitHub": scan_github, "Moltbook": scan_moltbook}
+
+
+def scan_all(deadline=SCAN_DEADLINE, concurrent=True, pool=None, bases=None, github_cache=None):
+    """扫描全部平台，返回 (全部条目, {来源: 统计})
+
+    concurrent 时各平台并发扫描；所有请求的超时都截到全局截止时间，
+    到点还没完成的来源记为 deadline，其结果丢弃。
+    统计包含 latency (秒)、status、items、requests、bytes。
+    github_cache 为 GitHub 响应缓存文件 (默认 GITHUB_CACHE)，替身扫描应传临时文件。
+    """
+    pool = pool or POOL
+    bases = bases or {}
+    started = time.monotonic()
+    until = started + deadline
+    stats = {name: {"status": "pending", "requests": 0, "bytes": 0} for name in SCANNERS}
+    results = {}
+    
+    def run(name):
+        t = time.monotonic()
+        options = {"cache_file": github_cache} if name == "GitHub" and github_cache else {}
+        items = SCANNERS[name](pool=pool, deadline=until, base=bases.get(name), stats=stats[name], **options)
+        stats[name]["latency"] = round(time.monotonic() - t, 3)
+        stats[name]["items"] = len(items)
+        return items
+    
+    if concurrent:
+        executor = ThreadPoolExecutor(max_workers=len(SCANNERS), thread_name_prefix="learn-scan")
+        futures = {executor.submit(run, name): name for name in SCANNERS}
+        done, pending = wait(futures, timeout=deadline)
+        for future in done:
+            results[futures[future]] = future.result()
+        # 还在跑的请求超时也不会晚于截止时间，不必等
+        executor.shutdown(wait=False, cancel_futures=True)
+    else:
+        for name in SCANNERS:
+            if time.monotonic() >= until:
+                break
+            results[name] = run(name)
+    
+    for name in SCANNERS:
+        if name not in results:
+            # 换成新 dict：还在跑的扫描线程稍后写入的是旧的那份
+            stats[name] = dict(stats[name], status="deadline", latency=round(time.monotonic() - started, 3), items=0)
+    unfinished = [name for name in SCANNERS if name not in results]
+    if unfinished:
+        log(f"⚠️ 超过扫描截止时间 {deadline} 秒，未完成: {', '.join(unfinished)}")
+    
+    # 按固定顺序合并，结果与串行扫描一致
+    all_skills = []
+    for name in SCANNERS:
+        all_skills.extend(results.get(name, []))
+    return all_skills, stats
+
+
 # ============ 4. 去重和评估 ============
-def deduplicate_and_score(all_skills):
-    """去重并评估质量"""
+SHINGLE_TOKEN = re.compile(r"[a-z0-9]+|[\u4e00-\u9fff]")
+# 索引记录 (array('I'))：[链接哈希 ×2, 标题数字哈希, 标题签名 ×PERMS, 描述签名 ×PERMS]
+RECORD_URL, RECORD_DIGITS, RECORD_TITLE = 0, 2, 3
+RECORD_DESC = RECORD_TITLE + NEAR_DUP_PERMS
+RECORD_SIZE = RECORD_DESC + NEAR_DUP_PERMS
+# 空标题 / 空描述的签名 (真实 k-gram 的最小哈希不会全是 0)
+EMPTY_SIGNATURE = array.array("I", bytes(4 * NEAR_DUP_PERMS))
+
+
+@functools.lru_cache(maxsize=1 << 14)
+def shingle_hashes(shingle):
+    """一个 k-gram 在 NEAR_DUP_PERMS 个哈希函数下的值：shake_128 输出切成 uint32
+
+    k-gram 在不同项目间大量重复，缓存后签名只剩逐位取最小值。
+    """
+    return array.array("I", hashlib.shake_128(shingle.encode("utf-8")).digest(4 * NEAR_DUP_PERMS))
+
+
+def grams(text, k=NEAR_DUP_SHINGLE):
+    """字符 k-gram 集合"""
+    if len(text) <= k:
+        return {text} if text else set()
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def title_tokens(title):
+    """标题分词 (小写，只留字母数字和汉字)，去掉末尾的 TITLE_COPY_SUFFIXES"""
+    tokens = SHINGLE_TOKEN.findall((title or "").lower())
+    while len(tokens) > 1 and tokens[-1] in TITLE_COPY_SUFFIXES:
+        tokens.pop()
+    return tokens
+
+
+def minhash(items):
+    """k-gram 集合的 MinHash 签名 (array('I'))，空集合返回 EMPTY_SIGNATURE"""
+    if not items:
+        return EMPTY_SIGNATURE
+    return array.array("I", map(min, zip(*map(shingle_hashes, items))))
+
+
+def identity_key(skill):
+    """项目的唯一标识：去掉协议的小写链接 (GitHub 即仓库地址)，没有链接时用 来源:标题"""
+    url = (skill.get("url") or "").strip().lower().rstrip("/")
+    if url:
+        return url.split("://", 1)[-1]
+    return f"{skill.get('source', '')}:{(skill.get('title') or '').strip().lower()}"
+
+
+def skill_fingerprint(skill):
+    """项目的索引记录 (布局见 RECORD_*)
+
+    标题去掉分隔符再切 k-gram (awesome-agent / AwesomeAgent 相同)，描述保留空格分词。
+    """
+    tokens = title_tokens(skill.get("title", ""))
+    digits = " ".join(re.findall(r"\d+", " ".join(tokens)))
+    record = array.array("I")
+    record.frombytes(hashlib.blake2b(identity_key(skill).encode("utf-8"), digest_size=8).digest()
+                     + hashlib.blake2b(digits.encode("utf-8"), digest_size=4).digest())
+    record.extend(minhash(grams("".join(tokens))))
+    description = " ".join(SHINGLE_TOKEN.findall((skill.get("description") or "").lower()))
+    record.extend(minhash(grams(description)))
+    return record
+
+
+class NearDuplicateIndex:
+    """项目去重索引：链接精确匹配 + 标题 / 描述 MinHash 的 LSH 索引
+
+    标题签名按 bands 段切开，每段的字节前面加上标题数字的哈希作为桶键：
+    数字不同的项目 (clawhub-skill-1 / clawhub-skill-2) 不会成为候选，
+    查询只和至少一段完全相同的候选比较，不随已收录条数线性增长。
+    标题和描述分开比较，共同的描述不会让标题不同的项目被判为重复。
+    """
+
+    def __init__(self, bands=NEAR_DUP_BANDS, title_threshold=NEAR_DUP_TITLE_THRESHOLD,
+                 desc_threshold=NEAR_DUP_DESC_THRESHOLD, title_only_threshold=NEAR_DUP_TITLE_ONLY_THRESHOLD):
+        if NEAR_DUP_PERMS % bands:
+            raise ValueError(f"签名长度 {NEAR_DUP_PERMS} 不能均分成 {bands} 段")
+        self.bands = bands
+        self.rows = NEAR_DUP_PERMS // bands
+        self.title_threshold = title_threshold
+        self.desc_threshold = desc_threshold
+        self.title_only_threshold = title_only_threshold
+        self.records = []
+        self.urls = {}
+        self.buckets = [{} for _ in range(bands)]
+        # 累计比较过的候选数 (基准测试用)
+        self.compared = 0
+
+    def __len__(self):
+        return len(self.records)
+
+    def _band_keys(self, record):
+        data = record.tobytes()
+        size = record.itemsize
+        digits = data[RECORD_DIGITS * size:RECORD_TITLE * size]
+        start, width = RECORD_TITLE * size, self.rows * size
+        return [digits + data[start + i * width:start + (i + 1) * width] for i in range(self.bands)]
+
+    @staticmethod
+    def _similarity(a, b, start):
+        """两条记录从 start 开始的签名的估计 Jaccard"""
+        end = start + NEAR_DUP_PERMS
+        return sum(x == y for x, y in zip(a[start:end], b[start:end])) / NEAR_DUP_PERMS
+
+    def is_near(self, record, other):
+        """两条记录是否近似重复 (不看链接)"""
+        if record[RECORD_DIGITS] != other[RECORD_DIGITS]:
+            return False
+        title = self._similarity(record, other, RECORD_TITLE)
+        if any(record[RECORD_DESC:]) and any(other[RECORD_DESC:]):
+            return (title >= self.title_threshold
+                    and self._similarity(record, other, RECORD_DESC) >= self.desc_threshold)
+        return title >= self.title_only_threshold
+
+    def add(self, record):
+        """收录一条记录，返回它的编号"""
+        idx = len(self.records)
+        self.records.append(record)
+        self.urls.setdefault(record[RECORD_URL:RECORD_DIGITS].tobytes(), idx)
+        if any(record[RECORD_TITLE:RECORD_DESC]):
+            for bucket, key in zip(self.buckets, self._band_keys(record)):
+                bucket.setdefault(key, []).append(idx)
+        return idx
+
+    def query(self, record):
+        """已收录的重复项目 (编号, "url" | "near")，没有重复返回 None"""
+        idx = self.urls.get(record[RECORD_URL:RECORD_DIGITS].tobytes())
+        if idx is not None:
+            return idx, "url"
+        if not any(record[RECORD_TITLE:RECORD_DESC]):
+            return None
+        candidates = set()
+        for bucket, key in zip(self.buckets, self._band_keys(record)):
+            candidates.update(bucket.get(key, ()))
+        self.compared += len(candidates)
+        for idx in sorted(candidates):
+            if self.is_near(record, self.records[idx]):
+                return idx, "near"
+        return None
+
+    @classmethod
+    def load(cls, path=NEAR_DUP_INDEX, discovered_file=DISCOVERED_FILE):
+        """加载已保存发现的索引记录；索引文件不存在时从 discovered_file 重建一次"""
+        index = cls()
+        if os.path.exists(path):
+            data = array.array("I")
+            with open(path, "rb") as f:
+                raw = f.read()
+            # 写到一半的尾部 (进程中断) 直接丢弃
+            data.frombytes(raw[:len(raw) - len(raw) % (RECORD_SIZE * data.itemsize)])
+            for i in range(0, len(data), RECORD_SIZE):
+                index.add(data[i:i + RECORD_SIZE])
+            return index
+        
+        records = []
+        if os.path.exists(discovered_file):
+            with open(discovered_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        skill = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(skill, dict):
+                        records.append(skill_fingerprint(skill))
+                        index.add(records[-1])
+        if records:
+            index.append_to(path, records)
+        return index
+
+    def append_to(self, path, records):
+        """把索引记录追加到索引文件"""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "ab") as f:
+            for record in records:
+                f.write(record.tobytes())
+
+
+def find_duplicates(skills, history=None):
+    """按 NearDuplicateIndex 去重，返回 (唯一项目, {"url": n, "near": n, "known": n})
+
+    本次扫描内链接相同或近似重复的项目只保留第一个；和 history (已保存
+    发现的索引) 重复的项目保留但标记 known=True。
+    """
+    index = NearDuplicateIndex()
+    unique = []
+    counts = {"url": 0, "near": 0, "known": 0}
+    for skill in skills:
+        record = skill_fingerprint(skill)
+        match = index.query(record)
+        if match is not None:
+            counts[match[1]] += 1
+            continue
+        index.add(record)
+        if history is not None and history.query(record) is not None:
+            skill["known"] = True
+            counts["known"] += 1
+        unique.append(skill)
+    return unique, counts
+
+
+def deduplicate_and_score(all_skills, history=None):
+    """去重并评估质量
+
+    链接 (GitHub 仓库地址) 相同的视为同一项目；fork、改名的副本、换了标题的
+    同一帖子由 MinHash LSH 识别为近似重复 (见 NearDuplicateIndex)。给了
+    history 时，和历史发现重复的项目标记 known=True，报告照常统计，但不再保存。
+    """
     log("📊 去重和评估...")
     
     # 去重
-    seen = set()
-    unique = []
-    for skill in all_skills:
-        key = skill["title"].lower()
-        if key not in seen:
-            seen.add(key)
-            unique.append(skill)
+    unique, counts = find_duplicates(all_skills, history)
     
     # 评估质量分数
     for skill in unique:
@@ -166,27 +735,35 @@ def deduplicate_and_score(all_skills):
     # 排序
     unique.sort(key=lambda x: x.get("quality_score", 0), reverse=True)
     
-    log(f"   去重后: {len(unique)} 个唯一项目")
+    log(f"   去重后: {len(unique)} 个唯一项目 (同一链接 {counts['url']} 个，近似重复 {counts['near']} 个，"
+        f"已发现过 {counts['known']} 个)")
     return unique
 
 # ============ 5. 保存发现 ============
-def save_discovered(skills):
-    """保存发现到文件"""
+def save_discovered(skills, history=None, index_file=NEAR_DUP_INDEX):
+    """保存发现到文件 (跳过 known 的项目)，并把索引记录追加到去重索引"""
     log("💾 保存发现...")
     
     Path(DISCOVERED_FILE).parent.mkdir(parents=True, exist_ok=True)
     
+    fresh = [skill for skill in skills if not skill.get("known")][:20]  # 只保存前20个
     with open(DISCOVERED_FILE, "a", encoding="utf-8") as f:
-        for skill in skills[:20]:  # 只保存前20个
+        for skill in fresh:
             f.write(json.dumps({
                 **skill,
                 "discovered_at": datetime.now().isoformat()
             }) + "\n")
     
-    log(f"   已保存 {min(len(skills), 20)} 个发现")
+    if history is not None:
+        records = [skill_fingerprint(skill) for skill in fresh]
+        for record in records:
+            history.add(record)
+        history.append_to(index_file, records)
+    
+    log(f"   已保存 {len(fresh)} 个发现")
 
 # ============ 6. 生成报告 ============
-def generate_report(skills):
+def generate_report(skills, scan_stats=None):
     """生成学习报告"""
     log("\n" + "=" * 50)
     log("📋 自主学习报告")
@@ -214,44 +791,309 @@ def generate_report(skills):
     high_score = [s for s in skills if s.get("quality_score", 0) > 0.7]
     log(f"\n🎯 推荐关注 ({len(high_score)} 个高分项目)")
     
+    if scan_stats:
+        log(f"\n⏱ 各来源耗时:")
+        for source, info in sorted(scan_stats.items(), key=lambda x: x[1].get("latency", 0), reverse=True):
+            log(f"   {source}: {info.get('latency', 0):.2f}秒 ({info.get('status')})，"
+                f"{info.get('items', 0)} 条，{info.get('requests', 0)} 次请求")
+    
     return {
         "total": len(skills),
         "by_source": by_source,
         "by_category": by_category,
         "high_score_count": len(high_score),
-        "top5": skills[:5]
+        "top5": skills[:5],
+        "latency": scan_stats or {}
     }
 
+# ============ 本地替身服务器 ============
+def start_stand_in(delays=None, github_quota=1000, github_window=60, github_total=25):
+    """启动模拟 ClawHub / GitHub / Moltbook API 的本地服务器 (HTTP/1.1 keep-alive)
+
+    delays: {来源: 每个请求的延迟秒数}。GitHub 搜索模拟 ETag / 304、分页 (Link 头，
+    每个查询共 github_total 条) 和配额 (每 github_window 秒 github_quota 次，304 不计，
+    用完返回 403)；配额状态在 server.github_rate 里，测试时可以直接改。
+    返回 (server, base_url)，用完调用 server.shutdown()。
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlencode
+    
+    delays = delays or {}
+    rate = {"limit": github_quota, "remaining": github_quota, "reset": int(time.time()) + github_window}
+    rate_lock = threading.Lock()
+    
+    def payload(path, query):
+        if path == "/api/skills":
+            return "ClawHub", {"skills": [{"name": f"clawhub-skill-{i}", "description": "automation skill",
+                                           "url": f"https://clawhub.com/s/{i}", "rating": 0.5} for i in range(20)]}
+        if path == "/search/repositories":
+            q = query.get("q", [""])[0].split("+")[0].split(" ")[0]
+            per_page = int(query.get("per_page", ["30"])[0])
+            page = int(query.get("page", ["1"])[0])
+            start = (page - 1) * per_page
+            return "GitHub", {"total_count": github_total,
+                              "items": [{"name": f"{q}-repo-{i}", "description": f"{q} project",
+                                         "html_url": f"https://github.com/x/{q}-{i}",
+                                         "stargazers_count": 100 * i}
+                                        for i in range(start, min(start + per_page, github_total))]}
+        if path == "/api/papers":
+            return "Moltbook", {"papers": [{"title": f"paper {i}", "abstract": "agent research",
+                                            "url": f"https://moltbook.com/p/{i}", "citation_count": i}
+                                           for i in range(10)]}
+        return None, None
+    
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            query = parse_qs(parts.query)
+            source, data = payload(parts.path, query)
+            time.sleep(delays.get(source, 0))
+            status = 200 if data is not None else 404
+            body = json.dumps(data if data is not None else {"message": "Not Found"}).encode()
+            headers = {"Content-Type": "application/json"}
+            
+            if source == "GitHub":
+                etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+                page = int(query.get("page", ["1"])[0])
+                if page * int(query.get("per_page", ["30"])[0]) < github_total:
+                    query["page"] = [str(page + 1)]
+                    next_url = f"http://{self.headers['Host']}{parts.path}?{urlencode(query, doseq=True, safe='+:>')}"
+                    headers["Link"] = f'<{next_url}>; rel="next"'
+                with rate_lock:
+                    if time.time() >= rate["reset"]:
+                        rate.update(remaining=rate["limit"], reset=int(time.time()) + github_window)
+                    if self.headers.get("If-None-Match") == etag:
+                        status, body = 304, b""
+                    elif rate["remaining"] <= 0:
+                        status, body = 403, b'{"message": "API rate limit exceeded"}'
+                        headers.pop("Link", None)
+                    else:
+                        rate["remaining"] -= 1
+                        headers["ETag"] = etag
+                    headers.update({"X-RateLimit-Limit": str(rate["limit"]),
+                                    "X-RateLimit-Remaining": str(rate["remaining"]),
+                                    "X-RateLimit-Reset": str(rate["reset"])})
+            try:
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.github_rate = rate
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def run_stand_in(hang=6.0, delay=0.3, deadline=3.0):
+    """用本地替身对比串行 / 并发扫描：ClawHub 挂起 hang 秒，GitHub / Moltbook 每个请求 delay 秒
+
+    两种模式各用一个临时的 GitHub 缓存 (都是冷缓存)，不写入 GITHUB_CACHE。
+    """
+    import tempfile
+    
+    server, base = start_stand_in({"ClawHub": hang, "GitHub": delay, "Moltbook": delay})
+    bases = {name: base for name in SCANNERS}
+    timings = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for mode in ("serial", "concurrent"):
+                pool = ConnectionPool()
+                started = time.perf_counter()
+                skills, stats = scan_all(deadline=deadline, concurrent=(mode == "concurrent"), pool=pool,
+                                         bases=bases, github_cache=os.path.join(tmp, f"github_cache_{mode}.json"))
+                timings[mode] = {"elapsed": time.perf_counter() - started, "items": len(skills), "stats": stats,
+                                 "connections": pool.created, "reused": pool.reused}
+                pool.close()
+    finally:
+        server.shutdown()
+    
+    print("\n" + "=" * 60)
+    for mode, t in timings.items():
+        print(f"{mode:10s} 耗时 {t['elapsed']:.2f}秒  条目 {t['items']}  "
+              f"新建连接 {t['connections']}  复用 {t['reused']}")
+        for name, info in t["stats"].items():
+            print(f"    {name:9s} {info.get('latency', 0):6.2f}秒  {info['status']:8s} "
+                  f"{info.get('items', 0):3d} 条  {info['requests']} 次请求")
+    return timings
+
+
+def run_github_mock(quota=5, window=3):
+    """用模拟 GitHub API 演示配额调度与条件请求
+
+    1. 冷缓存：配额 quota 次 / window 秒，不够翻完所有页，用完后等到重置再继续
+    2. 再扫一次：全部 304，不消耗配额
+    3. 配额用完且要等很久才重置：不发请求，直接用缓存结果
+    """
+    import tempfile
+    
+    server, base = start_stand_in(github_quota=quota, github_window=window)
+    phases = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_file = os.path.join(tmp, "github_cache.json")
+            for phase in ("冷缓存", "条件请求", "配额耗尽"):
+                if phase == "配额耗尽":
+                    server.github_rate.update(remaining=0, reset=int(time.time()) + 3600)
+                stats = {}
+                pool = ConnectionPool()
+                started = time.perf_counter()
+                skills = scan_github(pool, time.monotonic() + SCAN_DEADLINE, base, stats, cache_file)
+                phases[phase] = dict(stats, elapsed=time.perf_counter() - started, items=len(skills))
+                pool.close()
+    finally:
+        server.shutdown()
+    
+    print("\n" + "=" * 60)
+    for phase, t in phases.items():
+        print(f"{phase:6s} 耗时 {t['elapsed']:5.2f}秒  条目 {t['items']:3d}  请求 {t.get('requests', 0)}  "
+              f"304 {t.get('not_modified', 0)}  旧缓存 {t.get('stale', 0)}  剩余配额 {t.get('rate_remaining')}  "
+              f"({t['status']})")
+    return phases
+
+
+def run_dedup_bench(n=20000, queries=200, seed=1):
+    """去重基准与误判检查
+
+    1. 合成 n 条已发现项目，对比 LSH 索引与逐条比较的查重耗时和结果；查询一半是
+       已有项目的变体 (加 -fork 后缀、改大小写和分隔符、描述改一个词)，一半是全新项目
+    2. 已知应判 / 不应判为重复的项目对 (fork、改名、同一帖子换标题 / 共用描述的
+       不同项目、标题相近的不同仓库)
+    3. 本地替身 API 的扫描结果：各条链接都不同，去重后应一条不少 (GitHub 缓存用临时文件)
+    """
+    import tempfile
+    
+    rng = random.Random(seed)
+    words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9)))
+             for _ in range(3000)]
+    
+    def make_item():
+        return {"title": "-".join(rng.sample(words, rng.randint(2, 3))),
+                "description": " ".join(rng.choice(words) for _ in range(rng.randint(6, 14))),
+                "url": f"https://example.com/{rng.getrandbits(64):x}"}
+    
+    def variant(item):
+        title, description = item["title"], item["description"].split()
+        kind = rng.randrange(3)
+        if kind == 0:
+            title += "-fork"
+        elif kind == 1:
+            title = "".join(part.capitalize() for part in title.split("-"))
+        else:
+            description[rng.randrange(len(description))] = rng.choice(words)
+        return {"title": title, "description": " ".join(description),
+                "url": f"https://example.com/{rng.getrandbits(64):x}"}
+    
+    corpus = [make_item() for _ in range(n)]
+    started = time.perf_counter()
+    records = [skill_fingerprint(item) for item in corpus]
+    sign_time = time.perf_counter() - started
+    
+    index = NearDuplicateIndex()
+    started = time.perf_counter()
+    for record in records:
+        index.add(record)
+    build_time = time.perf_counter() - started
+    
+    probes = [(variant(rng.choice(corpus)), True) for _ in range(queries // 2)]
+    probes += [(make_item(), False) for _ in range(queries - len(probes))]
+    probe_records = [skill_fingerprint(item) for item, _ in probes]
+    
+    started = time.perf_counter()
+    lsh = [index.query(record) is not None for record in probe_records]
+    lsh_time = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    linear = [any(record[RECORD_URL:RECORD_DIGITS] == other[RECORD_URL:RECORD_DIGITS]
+                  or index.is_near(record, other) for other in records)
+              for record in probe_records]
+    linear_time = time.perf_counter() - started
+    
+    expected = [is_dup for _, is_dup in probes]
+    print("\n" + "=" * 60)
+    print(f"已收录 {n} 条  签名 {sign_time:.2f}秒 ({sign_time / n * 1e6:.0f} µs/条)  建索引 {build_time:.2f}秒")
+    print(f"LSH 查询   {queries} 次: {lsh_time * 1000:8.1f} ms  平均候选 {index.compared / queries:.1f} 条  "
+          f"判重 {sum(lsh)}  (其中变体 {sum(l and e for l, e in zip(lsh, expected))}/{sum(expected)})")
+    print(f"逐条比较   {queries} 次: {linear_time * 1000:8.1f} ms  判重 {sum(linear)}  "
+          f"与 LSH 不一致 {sum(l != m for l, m in zip(lsh, linear))}")
+    
+    agent = "A framework for building autonomous AI agents with tools and memory"
+    post = "We study how language model agents can improve themselves through iterative reflection on past failures."
+    pairs = [
+        ({"title": "awesome-agent", "description": agent}, {"title": "awesome-agent-fork", "description": agent}, True),
+        ({"title": "awesome-agent", "description": agent}, {"title": "AwesomeAgent", "description": agent + "."}, True),
+        ({"title": "Self-improving agents via reflection", "description": post},
+         {"title": "Self improving agents through reflection", "description": post}, True),
+        ({"title": "clawhub-skill-1", "description": "automation skill"},
+         {"title": "clawhub-skill-2", "description": "automation skill"}, False),
+        ({"title": "awesome-ai-agents", "description": "A curated list of awesome AI agents"},
+         {"title": "awesome-ai-tools", "description": "A curated list of awesome AI tools"}, False),
+        ({"title": "openclaw-skill-weather", "description": "Weather skill for OpenClaw"},
+         {"title": "openclaw-skill-calendar", "description": "Calendar skill for OpenClaw"}, False),
+        ({"title": "agent"}, {"title": "agents"}, False),
+    ]
+    wrong = 0
+    print("\n已知项目对:")
+    for a, b, should in pairs:
+        got = index.is_near(skill_fingerprint(a), skill_fingerprint(b))
+        wrong += got != should
+        print(f"  {'OK  ' if got == should else 'FAIL'} {'重复' if got else '不同'}  {a['title']} | {b['title']}")
+    
+    server, base = start_stand_in()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            skills, _ = scan_all(deadline=SCAN_DEADLINE, pool=ConnectionPool(), bases={name: base for name in SCANNERS},
+                                 github_cache=os.path.join(tmp, "github_cache.json"))
+    finally:
+        server.shutdown()
+    unique, counts = find_duplicates(skills)
+    distinct = len({identity_key(skill) for skill in skills})
+    wrong += len(unique) != distinct
+    print(f"\n替身数据: 扫描 {len(skills)} 条 (不同链接 {distinct})，去重后 {len(unique)} 条  {counts}")
+    
+    return {"sign": sign_time, "build": build_time, "lsh": lsh_time, "linear": linear_time,
+            "lsh_hits": sum(lsh), "linear_hits": sum(linear), "expected": sum(expected),
+            "stand_in": len(unique), "stand_in_distinct": distinct, "wrong": wrong}
+
+
 # ============ 主函数 ============
 def main():
     log("=" * 50)
     log("🚀 开始自主学习扫描")
     log("=" * 50)
     
-    all_skills = []
-    
-    # 扫描各平台
-    all_skills.extend(scan_clawhub())
-    all_skills.extend(scan_github())
-    all_skills.extend(scan_moltbook())
+    # 并发扫描各平台
+    all_skills, scan_stats = scan_all()
     
     if not all_skills:
         log("❌ 没有发现任何新技能")
         return
     
-    # 去重和评估
-    skills = deduplicate_and_score(all_skills)
+    # 去重和评估 (同时和已保存的发现比对)
+    history = NearDuplicateIndex.load()
+    skills = deduplicate_and_score(all_skills, history)
     
     # 保存
-    save_discovered(skills)
+    save_discovered(skills, history)
     
     # 报告
-    report = generate_report(skills)
+    report = generate_report(skills, scan_stats)
     
     # 提交到 GitHub
     log("\n📤 提交到 GitHub...")
     run_git(f'git add -A', WORKSPACE)
-    run_git(f'git commit -m "learn: 自主学习扫描 {datetime.now().strftime('%Y-%m-%d %H:%M')}"', WORKSPACE)
+    stamp = datetime.now().strftime('%Y-%m-%d %H:%M')
+    run_git(f'git commit -m "learn: 自主学习扫描 {stamp}"', WORKSPACE)
     run_git(f'git push origin main', WORKSPACE)
     log("   推送成功!")
     
@@ -260,4 +1102,18 @@ def main():
     return report
 
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 1 and sys.argv[1] in ("stand-in", "github-mock", "dedup-bench"):
+        # 替身 / 基准模式的日志只打印，不写入正式的 learning.log
+        LOG_FILE = None
+    if len(sys.argv) > 1 and sys.argv[1] == "stand-in":
+        # python auto_learn.py stand-in  用本地替身 API 对比串行与并发扫描
+        run_stand_in()
+    elif len(sys.argv) > 1 and sys.argv[1] == "github-mock":
+        # python auto_learn.py github-mock  用模拟 GitHub API 演示配额调度与 ETag 缓存
+        run_github_mock()
+    elif len(sys.argv) > 1 and sys.argv[1] == "dedup-bench":
+        # python auto_learn.py dedup-bench [条数]  对比 LSH 近似去重与逐条比较
+        if run_dedup_bench(int(sys.argv[2]) if len(sys.argv) > 2 else 20000)["wrong"]:
+            sys.exit(1)
+    else:
+        main()
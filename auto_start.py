@@ -9,9 +9,13 @@ OpenClaw Auto Start - 启动时自动运行
 import os
 import sys
 import json
+import time
+import hashlib
 import subprocess
 from datetime import datetime
-from pathlib import Path
+from buffered_log import get_logger
+from step_runner import Step, run_steps, summarize
+from result_cache import ResultCache
 
 # ============== 配置 ==============
 WORKSPACE = "C:/Users/殇/.openclaw/workspace"
@@ -20,46 +24,110 @@ REPORT_FILE = f"{WORKSPACE}/daily_briefing.md"
 LOG_FILE = f"{WORKSPACE}/auto_start.log"
 UPDATE_SCRIPT = f"{WORKSPACE}/auto_update.ps1"
 
+# 各启动步骤的超时 (秒)：版本检查最多 60 秒检查 + 120 秒更新；RSS 抓取自带 30 秒截止时间
+STEP_TIMEOUTS = {"version_check": 200, "rss": 60, "briefing": 30}
+
+# 简报输入的状态 (RSS 数据文件的大小 / 修改时间与内容哈希)：没变化时不重新生成简报
+BRIEFING_STATE = f"{WORKSPACE}/daily_briefing.state.json"
+# 每个源在简报中展示的文章数、标题 / 摘要截断长度
+BRIEFING_ARTICLES_PER_FEED = 5
+BRIEFING_TITLE_CHARS = 80
+BRIEFING_SUMMARY_CHARS = 150
+
+# 简报模板：模块加载时编译好的 f-string 片段 (比 str.format 快)，渲染时逐段追加到列表再 join
+BRIEFING_HEADER = lambda generated, sources, articles: f"""# 📰 OpenClaw Daily Briefing
+
+**生成时间**: {generated}
+
+## 📊 统计
+
+- **RSS 源**: {sources}
+- **文章总数**: {articles}
+
+---
+"""
+BRIEFING_CATEGORY = lambda category: f"\n## 📁 {category}\n\n"
+BRIEFING_SOURCE = lambda source: f"\n### 🔗 {source}\n\n"
+BRIEFING_ARTICLE = lambda title, summary, link: f"- **{title}**\n  - {summary}...\n  - [阅读更多]({link})\n\n"
+BRIEFING_FOOTER = lambda generated: f"""
+---
+*Generated by OpenClaw Auto Start at {generated}*
+"""
+
+# 版本检查结果缓存：有效期 (秒)；过期后 "background" 先沿用旧结果并在后台进程刷新，"sync" 当场重新检查
+VERSION_CACHE = f"{WORKSPACE}/version_cache.json"
+VERSION_CHECK_TTL = 6 * 3600
+VERSION_CHECK_MODE = "background"
+# 可以缓存的结论 (刚更新完的视为已是最新)；失败 / 超时不缓存，下次启动重试。
+# update_available 只由后台刷新写入 (后台只检查不更新)，前台读到它时当场检查并更新
+CACHEABLE_VERDICTS = {"up_to_date": "up_to_date", "completed": "completed", "updated": "up_to_date",
+                      "update_available": "update_available"}
+
+# 启动耗时历史 (JSON Lines，每次启动一行)：保留的启动次数；报告默认统计最近 N 次
+STARTUP_HISTORY = f"{WORKSPACE}/startup_history.jsonl"
+HISTORY_KEEP = 500
+HISTORY_WINDOW = 20
+# 回归判定：最近一次比之前的 p95 还慢，且比 p50 慢 REGRESSION_RATIO 倍、多出 REGRESSION_MIN_SECONDS 秒以上
+REGRESSION_RATIO = 1.5
+REGRESSION_MIN_SECONDS = 0.5
+REGRESSION_MIN_SAMPLES = 5
+TIMING_FIELDS = ("wall", "cpu", "bytes", "subprocess")
+
 class AutoStart:
     """自动启动类"""
     
-    def __init__(self):
+    def __init__(self, update_command=None, version_cache=None):
         self.start_time = datetime.now()
         self.results = {}
+        self.logger = get_logger(LOG_FILE, "auto_start")
+        # 更新器命令 (检查时追加 -CheckOnly)，测试时可换成 fake-updater
+        self.update_command = update_command or ["powershell", "-File", UPDATE_SCRIPT]
+        self.version_cache = ResultCache(version_cache or VERSION_CACHE, VERSION_CHECK_TTL)
+        # 各步骤的下载字节数 / 子进程耗时，run() 结束时写入启动耗时历史
+        self.metrics = {name: {"bytes": 0, "subprocess": 0.0, "cpu": 0.0} for name in STEP_TIMEOUTS}
     
     def log(self, message):
-        """日志记录"""
+        """日志记录 (写入缓冲，由后台线程刷盘)"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"[{timestamp}] {message}\n"
-        
-        with open(LOG_FILE, 'a', encoding='utf-8') as f:
-            f.write(log_entry)
+        self.logger.log(message)
         
         clean_message = message.replace("✅", "[OK]").replace("❌", "[FAIL]")
         print(f"[{timestamp}] {clean_message}")
     
-    def run_version_check(self):
-        """自动版本检查和更新"""
+    def _subprocess(self, step, cmd, timeout):
+        """运行子进程并把耗时计入 step 的 subprocess 时间"""
+        started = time.perf_counter()
+        try:
+            return subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        finally:
+            self.metrics[step]["subprocess"] += time.perf_counter() - started
+    
+    def run_version_check(self, mode=VERSION_CHECK_MODE, check_only=False):
+        """自动版本检查和更新
+
+        缓存未过期时直接沿用上次的结论；mode 为 "background" 时过期的结论也先沿用，
+        同时启动后台进程刷新；"sync" 过期后当场检查；"force" 忽略缓存。
+        check_only=True (后台刷新进程) 时发现新版本只记为 update_available，
+        不执行更新，由下一次前台启动更新并设置 needs_restart。
+        """
         self.log("="*60)
         self.log("OpenClaw Auto Start - Version 2.0")
         self.log(f"启动时间: {self.start_time.isoformat()}")
         self.log("="*60)
         self.log("[1/4] 自动版本检查...")
         
+        if mode != "force" and self._cached_version_check(mode):
+            return True
+        
         try:
             # 检查是否存在更新脚本
-            if not os.path.exists(UPDATE_SCRIPT):
+            if self.update_command[-1] == UPDATE_SCRIPT and not os.path.exists(UPDATE_SCRIPT):
                 self.log("  [WARN] 未找到更新脚本，跳过版本检查")
                 self.results["version_check"] = "skipped"
                 return True
             
             # 运行 PowerShell 更新脚本
-            result = subprocess.run(
-                ["powershell", "-File", UPDATE_SCRIPT, "-CheckOnly"],
-                capture_output=True,
-                text=True,
-                timeout=60
-            )
+            result = self._subprocess("version_check", self.update_command + ["-CheckOnly"], 60)
             
             if result.returncode == 0:
                 # 检查输出中是否有更新提示
@@ -67,15 +135,13 @@ class AutoStart:
                 if "已是最新版本" in output or "无需更新" in output:
                     self.log("  [OK] OpenClaw 已是最新版本")
                     self.results["version_check"] = "up_to_date"
+                elif "发现新版本" in output and check_only:
+                    self.log("  [INFO] 发现新版本，下次启动时更新")
+                    self.results["version_check"] = "update_available"
                 elif "发现新版本" in output:
                     self.log("  [INFO] 发现新版本，开始更新...")
                     # 执行完整更新
-                    update_result = subprocess.run(
-                        ["powershell", "-File", UPDATE_SCRIPT],
-                        capture_output=True,
-                        text=True,
-                        timeout=120
-                    )
+                    update_result = self._subprocess("version_check", self.update_command, 120)
                     if update_result.returncode == 0:
                         self.log("  [OK] OpenClaw 已更新到最新版本")
                         self.results["version_check"] = "updated"
@@ -97,8 +163,36 @@ class AutoStart:
             self.log(f"  [FAIL] 版本检查异常: {e}")
             self.results["version_check"] = "error"
         
+        verdict = CACHEABLE_VERDICTS.get(self.results.get("version_check"))
+        if verdict:
+            self.version_cache.put("version_check", verdict)
         return True
     
+    def _cached_version_check(self, mode):
+        """沿用缓存的版本检查结论，返回是否已沿用"""
+        verdict, age = self.version_cache.peek("version_check")
+        if verdict is None:
+            return False
+        if verdict == "update_available":
+            self.log("  [INFO] 后台检查发现新版本，当场更新")
+            return False
+        if age <= self.version_cache.ttl:
+            self.log(f"  [OK] 沿用 {age / 60:.0f} 分钟前的版本检查结果: {verdict}")
+        elif mode == "background":
+            started = self.version_cache.refresh_in_background("version_check", self.refresh_command())
+            self.log(f"  [OK] 版本检查结果已过期 ({age / 3600:.1f} 小时前)，先沿用 {verdict}，"
+                     + ("已在后台刷新" if started else "已有刷新进程在运行"))
+        else:
+            return False
+        self.results["version_check"] = verdict
+        self.results["version_check_cached"] = True
+        return True
+    
+    def refresh_command(self):
+        """后台刷新版本检查结果的命令行"""
+        return [sys.executable, os.path.abspath(__file__), "refresh-version",
+                "--updater", json.dumps(self.update_command), "--cache", self.version_cache.path]
+    
     def run_rss_fetcher(self):
         """运行 RSS 抓取"""
         self.log("="*60)
@@ -113,7 +207,11 @@ class AutoStart:
             from rss_fetcher import RSSFetcher
             
             fetcher = RSSFetcher()
-            results = fetcher.fetch_all()
+            try:
+                results = fetcher.fetch_all()
+            finally:
+                self.metrics["rss"]["bytes"] = fetcher.bytes_fetched
+                self.metrics["rss"]["cpu"] = fetcher.worker_cpu_time
             
             self.results["rss_sources"] = len(results)
             self.results["rss_articles"] = sum(len(r['articles']) for r in results)
@@ -128,66 +226,20 @@ class AutoStart:
             self.results["rss_articles"] = 0
             return []
     
-    def generate_briefing(self, rss_results):
-        """生成每日简报"""
-        self.log("[2/2] 生成每日简报...")
-        
-        # 读取 RSS 数据
-        if os.path.exists(RSS_DATA):
-            with open(RSS_DATA, 'r', encoding='utf-8') as f:
-                rss_data = json.load(f)
-        else:
-            rss_data = {"feeds": rss_results}
-        
-        # 生成 Markdown 报告
-        report = f"""# 📰 OpenClaw Daily Briefing
+    def generate_briefing(self, rss_results, force=False):
+        """生成每日简报
 
-**生成时间**: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-
-## 📊 统计
-
-- **RSS 源**: {rss_data.get('sources_count', len(rss_results))}
-- **文章总数**: {rss_data.get('total_articles', sum(len(r['articles']) for r in rss_results))}
-
----
-"""
-        
-        # 按类别组织
-        by_category = {}
-        for feed in rss_data.get('feeds', rss_results):
-            cat = feed.get('category', '其他')
-            if cat not in by_category:
-                by_category[cat] = []
-            by_category[cat].append(feed)
-        
-        # 生成每个类别的内容
-        for category, feeds in by_category.items():
-            report += f"\n## 📁 {category}\n\n"
-            
-            for feed in feeds:
-                report += f"\n### 🔗 {feed['source']}\n\n"
-                
-                for article in feed.get('articles', [])[:5]:
-                    title = article.get('title', '')[:80]
-                    link = article.get('link', '')
-                    summary = article.get('summary', '')[:150]
-                    
-                    report += f"- **{title}**\n"
-                    report += f"  - {summary}...\n"
-                    report += f"  - [阅读更多]({link})\n\n"
-        
-        # 添加时间戳
-        report += f"""
----
-*Generated by OpenClaw Auto Start at {datetime.now().isoformat()}*
-"""
-        
-        # 保存报告
-        with open(REPORT_FILE, 'w', encoding='utf-8') as f:
-            f.write(report)
+        RSS 数据与上次生成时相同 (且简报文件还在) 时跳过，返回 None。
+        """
+        self.log("[2/2] 生成每日简报...")
+        report, reason = build_briefing(rss_results, force=force)
         
-        self.log(f"  [OK] 简报已保存到: daily_briefing.md")
         self.results["report_file"] = REPORT_FILE
+        if report is None:
+            self.log(f"  [OK] {reason}，沿用现有简报")
+            self.results["briefing_skipped"] = True
+        else:
+            self.log(f"  [OK] 简报已保存到: daily_briefing.md")
         
         return report
     
@@ -197,18 +249,28 @@ class AutoStart:
         self.log("OpenClaw Auto Start - Version 2.0")
         self.log(f"启动时间: {self.start_time.isoformat()}")
         self.log("="*60)
+        started = time.perf_counter()
+        cpu_started = time.process_time()
         
-        # Step 1: 版本检查和更新
-        self.log("[1/4] 自动版本检查...")
-        self.run_version_check()
-        
-        # Step 2: 抓取 RSS
-        self.log("[2/4] 抓取 RSS 科技源...")
-        rss_results = self.run_rss_fetcher()
+        # 版本检查与 RSS 抓取互不依赖，并发执行；简报等 RSS 抓取结束后生成
+        self.log("[1-3/4] 版本检查 / 抓取 RSS 科技源 (并发)，随后生成每日简报...")
+        steps = [
+            Step("version_check", self.run_version_check, timeout=STEP_TIMEOUTS["version_check"]),
+            Step("rss", self.run_rss_fetcher, timeout=STEP_TIMEOUTS["rss"]),
+            Step("briefing", lambda rss_results: self.generate_briefing(rss_results or []),
+                 deps=("rss",), timeout=STEP_TIMEOUTS["briefing"]),
+        ]
+        outcome = run_steps(steps, log=self.log)
         
-        # Step 3: 生成简报
-        self.log("[3/4] 生成每日简报...")
-        self.generate_briefing(rss_results)
+        # 超时 / 异常的步骤没来得及写结果，补上状态
+        if outcome["version_check"]["status"] != "ok":
+            self.results.setdefault("version_check", outcome["version_check"]["status"])
+        if outcome["rss"]["status"] != "ok":
+            self.results.setdefault("rss_sources", 0)
+            self.results.setdefault("rss_articles", 0)
+        self.results["steps"] = summarize(outcome)
+        record = self.timing_record(outcome, time.perf_counter() - started, time.process_time() - cpu_started)
+        append_history(record)
         
         # Step 4: 完成
         end_time = datetime.now()
@@ -219,13 +281,392 @@ class AutoStart:
         self.log(f"版本检查: {self.results.get('version_check', 'N/A')}")
         self.log(f"RSS 源: {self.results.get('rss_sources', 0)}")
         self.log(f"文章数: {self.results.get('rss_articles', 0)}")
+        self.log("步骤耗时: " + ", ".join(f"{name} {info['elapsed']:.2f}秒 ({info['status']})"
+                                        for name, info in self.results["steps"].items()))
         self.log("="*60)
         
         return self.results
+    
+    def timing_record(self, outcome, wall, cpu):
+        """本次启动的耗时记录：每步 wall / cpu / bytes / subprocess，以及整体"""
+        steps = {}
+        for name, r in outcome.items():
+            extra = self.metrics.get(name, {})
+            steps[name] = {
+                "status": r["status"],
+                "wall": round(r["elapsed"], 3),
+                # 步骤线程自身 + 它的工作线程 (例如 RSS 并发抓取)
+                "cpu": round((r["cpu"] or 0) + extra.get("cpu", 0), 3),
+                "bytes": extra.get("bytes", 0),
+                "subprocess": round(extra.get("subprocess", 0), 3)
+            }
+        steps["total"] = {
+            "status": "ok",
+            "wall": round(wall, 3),
+            "cpu": round(cpu, 3),
+            "bytes": sum(s["bytes"] for s in steps.values()),
+            "subprocess": round(sum(s["subprocess"] for s in steps.values()), 3)
+        }
+        return {"at": self.start_time.isoformat(timespec="seconds"), "steps": steps}
+
+
+# ============== 每日简报 ==============
+
+def file_signature(path):
+    """(大小, 修改时间 ns)，文件不存在时返回 None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def load_state(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
 
+def build_briefing(rss_results, force=False, rss_file=None, report_file=None, state_file=None):
+    """生成简报并写入 report_file，返回 (简报文本, 说明)；跳过时简报文本为 None
 
-def main():
-    """主入口"""
+    两级跳过：RSS 数据文件的大小和修改时间都没变 -> 不读文件直接跳过；
+    文件被重写但简报用到的内容没变 (内容哈希相同) -> 不重写简报。
+    """
+    rss_file = rss_file or RSS_DATA
+    report_file = report_file or REPORT_FILE
+    state_file = state_file or BRIEFING_STATE
+    state = load_state(state_file) if not force and os.path.exists(report_file) else {}
+    
+    signature = file_signature(rss_file)
+    if signature is not None and state.get("signature") == signature:
+        return None, "RSS 数据文件未变化"
+    
+    # 读取 RSS 数据
+    if signature is not None:
+        with open(rss_file, 'r', encoding='utf-8') as f:
+            rss_data = json.load(f)
+    else:
+        rss_data = {"feeds": rss_results}
+    
+    sections, sources, articles = briefing_sections(rss_data, rss_results)
+    body = render_body(sections)
+    # 正文只编码一次，算哈希和写文件共用
+    body_bytes = body.encode('utf-8')
+    digest = briefing_digest(body_bytes, sources, articles)
+    skipped = state.get("digest") == digest
+    report = None
+    
+    if not skipped:
+        now = datetime.now()
+        header = BRIEFING_HEADER(now.strftime("%Y-%m-%d %H:%M:%S"), sources, articles)
+        footer = BRIEFING_FOOTER(now.isoformat())
+        report = header + body + footer
+        data = b"".join([header.encode('utf-8'), body_bytes, footer.encode('utf-8')])
+        if os.linesep != "\n":
+            # 与文本模式写入一致 (Windows 下换行为 \r\n)
+            data = data.replace(b"\n", os.linesep.encode())
+        with open(report_file, 'wb') as f:
+            f.write(data)
+    # 没有 RSS 数据文件时 (直接用内存里的结果) 只记内容哈希
+    with open(state_file, 'w', encoding='utf-8') as f:
+        json.dump({"signature": signature, "digest": digest}, f)
+    return report, "RSS 内容未变化" if skipped else "已重新生成"
+
+
+def briefing_sections(rss_data, rss_results):
+    """挑出简报要展示的内容
+
+    返回 ([(类别, [(源, [(标题, 摘要, 链接), ...]), ...]), ...], 源数, 文章总数)，
+    标题 / 摘要已按简报长度截断，类别按首次出现的顺序排列。
+    """
+    by_category = {}
+    for feed in rss_data.get('feeds', rss_results):
+        articles = [
+            (a.get('title', '')[:BRIEFING_TITLE_CHARS], a.get('summary', '')[:BRIEFING_SUMMARY_CHARS], a.get('link', ''))
+            for a in feed.get('articles', [])[:BRIEFING_ARTICLES_PER_FEED]
+        ]
+        by_category.setdefault(feed.get('category', '其他'), []).append((feed['source'], articles))
+    sources = rss_data.get('sources_count', len(rss_results))
+    total = rss_data.get('total_articles', sum(len(r['articles']) for r in rss_results))
+    return list(by_category.items()), sources, total
+
+
+def render_body(sections):
+    """用预编译模板渲染简报正文 (不含带时间的页眉页脚)"""
+    parts = []
+    append = parts.append
+    for category, feeds in sections:
+        append(BRIEFING_CATEGORY(category))
+        for source, items in feeds:
+            append(BRIEFING_SOURCE(source))
+            for title, summary, link in items:
+                append(BRIEFING_ARTICLE(title, summary, link))
+    return "".join(parts)
+
+
+def briefing_digest(body_bytes, sources, articles):
+    """简报内容的哈希：UTF-8 正文加统计数字，不含生成时间"""
+    digest = hashlib.sha1(f"{sources}\x1f{articles}\x1f".encode('utf-8'))
+    digest.update(body_bytes)
+    return digest.hexdigest()
+
+
+def benchmark_briefing(feeds=500, per_feed=10, repeats=5):
+    """对比简报生成的几种情况 (都包含读取 RSS 数据文件)
+
+    旧实现 (读取 + += 拼接 + 写文件) / 内容有变化 / 文件重写但内容未变 / 文件未变。
+    构造 feeds 个源、每个 per_feed 篇文章的 RSS 数据，耗时取 repeats 次中最快的一次。
+    """
+    import tempfile
+    
+    rss_data = {
+        "sources_count": feeds,
+        "total_articles": feeds * per_feed,
+        "feeds": [{
+            "source": f"Feed {i}",
+            "category": f"类别 {i % 8}",
+            "articles": [{"title": f"Feed {i} 文章 {j} " + "标题" * 30,
+                          "link": f"https://example.com/{i}/{j}",
+                          "summary": "摘要内容 " * 60} for j in range(per_feed)]
+        } for i in range(feeds)]
+    }
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        rss_file = os.path.join(tmp, "rss_feed.json")
+        report_file = os.path.join(tmp, "daily_briefing.md")
+        state_file = os.path.join(tmp, "state.json")
+        paths = {"rss_file": rss_file, "report_file": report_file, "state_file": state_file}
+        
+        def write_rss(fetched_at):
+            with open(rss_file, 'w', encoding='utf-8') as f:
+                json.dump(dict(rss_data, fetched_at=fetched_at), f, ensure_ascii=False, indent=2)
+        
+        def legacy():
+            with open(rss_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            report = BRIEFING_HEADER(datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                                     data['sources_count'], data['total_articles'])
+            by_category = {}
+            for feed in data['feeds']:
+                by_category.setdefault(feed.get('category', '其他'), []).append(feed)
+            for category, items in by_category.items():
+                report += f"\n## 📁 {category}\n\n"
+                for feed in items:
+                    report += f"\n### 🔗 {feed['source']}\n\n"
+                    for article in feed.get('articles', [])[:BRIEFING_ARTICLES_PER_FEED]:
+                        report += f"- **{article.get('title', '')[:BRIEFING_TITLE_CHARS]}**\n"
+                        report += f"  - {article.get('summary', '')[:BRIEFING_SUMMARY_CHARS]}...\n"
+                        report += f"  - [阅读更多]({article.get('link', '')})\n\n"
+            report += BRIEFING_FOOTER(datetime.now().isoformat())
+            with open(report_file, 'w', encoding='utf-8') as f:
+                f.write(report)
+        
+        def changed():
+            return build_briefing([], force=True, **paths)
+        
+        def rewritten():
+            # 抓取器重写了数据文件 (fetched_at 变了)，简报内容不变
+            os.utime(rss_file, ns=(time.time_ns(), time.time_ns()))
+            return build_briefing([], **paths)
+        
+        def unchanged():
+            return build_briefing([], **paths)
+        
+        write_rss(datetime.now().isoformat())
+        print(f"{feeds} 个源 × {per_feed} 篇 = {feeds * per_feed} 篇文章 "
+              f"(数据文件 {os.path.getsize(rss_file) / 1024 / 1024:.1f} MB)，"
+              f"简报展示 {feeds * min(per_feed, BRIEFING_ARTICLES_PER_FEED)} 篇")
+        timings = {}
+        for label, run in (("旧实现 (+= 拼接)", legacy), ("内容有变化 (模板)", changed),
+                           ("文件重写、内容未变", rewritten), ("文件未变", unchanged)):
+            best = None
+            for _ in range(repeats):
+                started = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[label] = best
+            print(f"  {label:18s} {best * 1000:9.3f} ms")
+    return timings
+
+
+# ============== 启动耗时历史 ==============
+
+def append_history(record, path=None, keep=HISTORY_KEEP):
+    """追加一条启动记录；行数超过 keep 的两倍时截断到最近 keep 条"""
+    path = path or STARTUP_HISTORY
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+    records = load_history(path)
+    if len(records) > keep * 2:
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for r in records[-keep:]:
+                f.write(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n")
+        os.replace(tmp, path)
+
+
+def load_history(path=None, limit=None):
+    """读取启动记录 (最近 limit 条)，跳过损坏的行"""
+    path = path or STARTUP_HISTORY
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records[-limit:] if limit else records
+
+
+def percentile(values, q):
+    """线性插值分位数，q 取 0~100"""
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = (len(values) - 1) * q / 100
+    low = int(k)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (k - low)
+
+
+def timing_report(window=HISTORY_WINDOW, path=None):
+    """打印最近 window 次启动每步的 p50 / p95，并把最近一次与之前的记录比较，标出回归
+
+    返回 {步骤: {字段: {"p50", "p95"}, "latest", "regression"}}。
+    """
+    records = load_history(path, window + 1)
+    if not records:
+        print("暂无启动耗时记录")
+        return {}
+    latest, previous = records[-1], records[:-1][-window:]
+    names = []
+    for r in records:
+        names.extend(n for n in r["steps"] if n not in names)
+    
+    print(f"最近 {len(records)} 次启动 (最新: {latest['at']})")
+    print(f"{'步骤':14s} {'wall p50':>9s} {'p95':>7s} {'cpu p50':>8s} {'p95':>7s} "
+          f"{'KB p50':>8s} {'子进程 p50':>9s} {'最近':>7s}")
+    report = {}
+    for name in names:
+        samples = [r["steps"][name] for r in records if name in r["steps"]]
+        stats = {field: {"p50": percentile([s.get(field, 0) for s in samples], 50),
+                         "p95": percentile([s.get(field, 0) for s in samples], 95)}
+                 for field in TIMING_FIELDS}
+        
+        # 回归：拿最近一次和之前的记录比 (不含最近一次本身)
+        now = latest["steps"].get(name, {}).get("wall")
+        before = [r["steps"][name]["wall"] for r in previous if name in r["steps"]]
+        regression = False
+        if now is not None and len(before) >= REGRESSION_MIN_SAMPLES:
+            p50, p95 = percentile(before, 50), percentile(before, 95)
+            regression = now > p95 and now > p50 * REGRESSION_RATIO and now - p50 > REGRESSION_MIN_SECONDS
+        report[name] = dict(stats, latest=now, regression=regression)
+        
+        flag = "  <-- 回归" if regression else ""
+        print(f"{name:14s} {stats['wall']['p50']:8.2f}s {stats['wall']['p95']:6.2f}s "
+              f"{stats['cpu']['p50']:7.2f}s {stats['cpu']['p95']:6.2f}s "
+              f"{stats['bytes']['p50'] / 1024:8.1f} {stats['subprocess']['p50']:9.2f}s "
+              f"{now if now is not None else float('nan'):6.2f}s{flag}")
+    
+    regressed = [name for name, r in report.items() if r["regression"]]
+    if regressed:
+        print(f"[WARN] 启动耗时回归: {', '.join(regressed)}")
+    return report
+
+
+# ============== 版本检查缓存演示 ==============
+
+def fake_updater(outdated=False, delay=1.0, check_only=True):
+    """模拟 auto_update.ps1：等待 delay 秒后输出与真实脚本相同的关键字"""
+    time.sleep(delay)
+    if not check_only:
+        print("更新完成")
+    elif outdated:
+        print("发现新版本: 9.9.9")
+    else:
+        print("当前版本 1.0.0，已是最新版本")
+    return 0
+
+
+def version_cache_demo(delay=1.0):
+    """用假更新器对比：无缓存 (当场检查) / 缓存命中 / 缓存过期 (后台刷新)"""
+    import tempfile
+    
+    updater = [sys.executable, os.path.abspath(__file__), "fake-updater", "--delay", str(delay)]
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_file = os.path.join(tmp, "version_cache.json")
+        timings = {}
+        for label in ("冷启动 (无缓存)", "缓存命中", "缓存过期 (后台刷新)"):
+            if label.startswith("缓存过期"):
+                # 把缓存时间改到 TTL 之前
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                data["version_check"]["at"] -= VERSION_CHECK_TTL + 60
+                with open(cache_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+            auto_start = AutoStart(updater, cache_file)
+            started = time.perf_counter()
+            cached = auto_start._cached_version_check("background")
+            lookup = time.perf_counter() - started
+            if not cached:
+                auto_start.run_version_check(mode="force")
+            timings[label] = {"seconds": time.perf_counter() - started, "lookup": lookup,
+                              "verdict": auto_start.results.get("version_check")}
+        
+        # 等后台刷新进程写回新的结论
+        cache = ResultCache(cache_file, VERSION_CHECK_TTL)
+        waited = time.perf_counter()
+        while cache.get("version_check") is None and time.perf_counter() - waited < delay + 10:
+            time.sleep(0.1)
+        _, age = cache.peek("version_check")
+    
+    print("\n" + "=" * 60)
+    for label, t in timings.items():
+        print(f"{label:18s} 耗时 {t['seconds'] * 1000:9.2f} ms  查缓存 {t['lookup'] * 1e6:8.1f} µs  结论 {t['verdict']}")
+    print(f"后台刷新完成: {age is not None and age < VERSION_CHECK_TTL} (缓存 {age or 0:.1f} 秒前写入)")
+    return timings
+
+
+def main(argv=None):
+    """主入口
+
+    python auto_start.py              执行启动流程
+    python auto_start.py timings [N]  最近 N 次启动每步耗时的 p50 / p95，标出回归
+    python auto_start.py refresh-version [--updater JSON] [--cache 文件]
+                                      重新检查版本并写入缓存 (后台刷新进程，只检查不更新)
+    python auto_start.py fake-updater [--outdated] [--delay 秒]
+                                      本地假更新器，模拟 auto_update.ps1 的输出
+    python auto_start.py version-cache-demo
+                                      用假更新器演示冷启动 / 缓存命中 / 过期后台刷新
+    python auto_start.py bench-briefing [源数] [每源文章数]
+                                      对比简报的拼接 / 模板渲染 / 内容未变时的耗时
+    """
+    argv = argv if argv is not None else sys.argv
+    command = argv[1] if len(argv) > 1 else None
+    options = {argv[i]: argv[i + 1] for i in range(2, len(argv) - 1) if argv[i].startswith("--")}
+    if command == "timings":
+        return timing_report(int(argv[2]) if len(argv) > 2 else HISTORY_WINDOW)
+    if command == "refresh-version":
+        updater = json.loads(options["--updater"]) if "--updater" in options else None
+        auto_start = AutoStart(updater, options.get("--cache"))
+        try:
+            auto_start.run_version_check(mode="force", check_only=True)
+        finally:
+            auto_start.version_cache.end_refresh("version_check")
+        return auto_start.results
+    if command == "fake-updater":
+        return fake_updater("--outdated" in argv, float(options.get("--delay", 1)), "-CheckOnly" in argv)
+    if command == "version-cache-demo":
+        return version_cache_demo()
+    if command == "bench-briefing":
+        return benchmark_briefing(*[int(a) for a in argv[2:4]])
+    
     auto_start = AutoStart()
     results = auto_start.run()
     return results
@@ -7,12 +7,38 @@ import sys
 import subprocess
 import json
 import os
+import threading
 from datetime import datetime
+from step_runner import Step, run_steps
+from result_cache import ResultCache
+# npm 版本查询结果与 auto_start.py 共用同一个缓存文件 (WORKSPACE 下) 和有效期：
+# "background" 过期后先沿用旧结果并在后台刷新，"sync" 过期后当场查询
+from auto_start import VERSION_CACHE, VERSION_CHECK_TTL, VERSION_CHECK_MODE
+
+# 各步骤超时 (秒)；版本检查 / 更新检查 / 健康检查互不依赖，并发执行，简报最后生成
+STEP_TIMEOUTS = {"version": 60, "update": 90, "health": 30, "brief": 30}
 
 # 强制 UTF-8 输出
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
 sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
+# 并发步骤的输出先收集在各自的缓冲里，步骤结束时整段打印，不会互相交错
+PRINT_LOCK = threading.Lock()
+
+def locked_print(text):
+    with PRINT_LOCK:
+        print(text, flush=True)
+
+def buffered_step(func):
+    """包装步骤函数：输出写入缓冲 (通过 out 参数)，结束时加锁整段打印"""
+    def run(*args):
+        lines = []
+        try:
+            return func(*args, out=lines.append)
+        finally:
+            locked_print("\n".join(lines))
+    return run
+
 def run_powershell_script(script_path, args=""):
     """运行 PowerShell 脚本"""
     try:
@@ -30,50 +56,63 @@ def run_powershell_script(script_path, args=""):
     except Exception as e:
         return -1, "", str(e)
 
-def check_version():
-    """检查版本"""
-    print("📦 检查 OpenClaw 版本...")
+def check_version(refresh=False, out=print):
+    """检查版本 (refresh=True 时忽略缓存)"""
+    out("📦 检查 OpenClaw 版本...")
+    cache = ResultCache(VERSION_CACHE, VERSION_CHECK_TTL)
+    if not refresh:
+        output, age = cache.peek("npm_version")
+        if output is not None and (age <= VERSION_CHECK_TTL or VERSION_CHECK_MODE == "background"):
+            note = f"{age / 60:.0f} 分钟前的结果"
+            if age > VERSION_CHECK_TTL:
+                cache.refresh_in_background("npm_version", [sys.executable, os.path.abspath(__file__), "refresh-version"])
+                note += "，已过期，后台刷新中"
+            out(f"  {output} ({note})")
+            return True
     try:
         result = subprocess.run(
             ["npm", "list", "-g", "openclaw", "--depth=0"],
             capture_output=True,
-            text=True
+            text=True,
+            timeout=STEP_TIMEOUTS["version"]
         )
-        print(f"  {result.stdout.strip()}")
+        out(f"  {result.stdout.strip()}")
+        if result.returncode == 0:
+            cache.put("npm_version", result.stdout.strip())
         return True
     except Exception as e:
-        print(f"  ⚠️ 版本检查失败: {e}")
+        out(f"  ⚠️ 版本检查失败: {e}")
         return False
 
-def auto_update():
+def auto_update(out=print):
     """自动更新检查"""
-    print("🔄 检查更新...")
+    out("🔄 检查更新...")
     script_path = os.path.join(os.path.dirname(__file__), "auto_update.ps1")
     
     if os.path.exists(script_path):
         code, stdout, stderr = run_powershell_script(script_path, "-CheckOnly")
         if code == 0:
-            print("✅ 更新检查完成")
+            out("✅ 更新检查完成")
             return True
         else:
-            print(f"⚠️ 更新检查失败: {stderr}")
+            out(f"⚠️ 更新检查失败: {stderr}")
             return False
     else:
-        print("  未找到更新脚本，跳过")
+        out("  未找到更新脚本，跳过")
         return True
 
-def system_health_check():
+def system_health_check(out=print):
     """系统健康检查"""
-    print("🏥 系统健康检查...")
-    print("  ✅ OpenClaw 服务: 运行中")
-    print("  ✅ 内存使用: 正常")
-    print("  ✅ 磁盘空间: 充足")
-    print("  ✅ 网络连接: 正常")
+    out("🏥 系统健康检查...")
+    out("  ✅ OpenClaw 服务: 运行中")
+    out("  ✅ 内存使用: 正常")
+    out("  ✅ 磁盘空间: 充足")
+    out("  ✅ 网络连接: 正常")
     return True
 
-def generate_startup_brief():
+def generate_startup_brief(out=print):
     """生成启动简报"""
-    print("📋 生成启动简报...")
+    out("📋 生成启动简报...")
     
     brief = f"""
 ╔══════════════════════════════════════════════════════════╗
@@ -88,7 +127,7 @@ def generate_startup_brief():
 ║  待办事项: 无                                            ║
 ╚══════════════════════════════════════════════════════════╝
 """
-    print(brief)
+    out(brief)
     
     # 保存简报
     with open("startup_brief.log", "a", encoding="utf-8") as f:
@@ -101,25 +140,27 @@ def main():
     print("🚀 OpenClaw 自动启动序列")
     print("=" * 50)
     
-    # Layer 1: 版本检查
-    print("\n[Layer 1] 版本管理")
-    check_version()
-    
-    # Layer 2: 自动更新
-    print("\n[Layer 2] 更新检查")
-    auto_update()
-    
-    # Layer 3: 健康检查
-    print("\n[Layer 3] 健康检查")
-    system_health_check()
-    
-    # 生成简报
-    print("\n[完成] 生成启动简报")
-    generate_startup_brief()
+    print("\n[Layer 1-3] 版本管理 / 更新检查 / 健康检查 (并发)")
+    steps = [
+        Step("version", buffered_step(check_version), timeout=STEP_TIMEOUTS["version"]),
+        Step("update", buffered_step(auto_update), timeout=STEP_TIMEOUTS["update"]),
+        Step("health", buffered_step(system_health_check), timeout=STEP_TIMEOUTS["health"]),
+        Step("brief", buffered_step(lambda *layers, out: generate_startup_brief(out=out)),
+             deps=("version", "update", "health"), timeout=STEP_TIMEOUTS["brief"]),
+    ]
+    outcome = run_steps(steps, log=locked_print)
+    print("\n步骤耗时: " + ", ".join(f"{name} {r['elapsed']:.2f}秒 ({r['status']})" for name, r in outcome.items()))
     
     print("\n" + "=" * 50)
     print("✅ OpenClaw 启动完成！")
     print("🎯 系统完全正常，可以开始使用。")
 
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 1 and sys.argv[1] == "refresh-version":
+        # 后台刷新进程：重新查询 npm 版本并写入缓存
+        try:
+            check_version(refresh=True)
+        finally:
+            ResultCache(VERSION_CACHE, VERSION_CHECK_TTL).end_refresh("npm_version")
+    else:
+        main()
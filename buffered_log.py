@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+缓冲异步日志 - RSSFetcher / AutoStart / auto_backup / auto_learn 共用
+
+每条日志先进内存缓冲区，由后台线程定时 (或缓冲区满时) 一次性写入文件，
+不再每行都 open / write / close。输出为 JSON Lines，每行一个对象：
+{"ts": "2026-10-18T08:00:00", "level": "INFO", "source": "rss_fetcher", "msg": "..."}
+文件超过 max_bytes 后轮转：当前文件压缩为 <文件>.1.gz，旧的依次后移，
+只保留 backups 份。进程退出时自动把缓冲区刷盘。
+"""
+
+import os
+import sys
+import json
+import gzip
+import time
+import atexit
+import shutil
+import threading
+from datetime import datetime
+
+# ============== 配置 ==============
+# 后台刷盘间隔 (秒)、缓冲区条数上限 (满了立即刷)、单个文件大小上限、保留的压缩备份数
+FLUSH_INTERVAL = 1.0
+BUFFER_LIMIT = 500
+MAX_BYTES = 5 * 1024 * 1024
+BACKUPS = 5
+
+
+def guess_level(message):
+    """从现有日志消息的标记推断级别"""
+    if "[FAIL]" in message or "[ERROR]" in message or "❌" in message or "失败" in message:
+        return "ERROR"
+    if "[WARN]" in message or "⚠️" in message:
+        return "WARN"
+    return "INFO"
+
+
+class BufferedLogger:
+    """缓冲 + 后台刷盘 + 按大小轮转压缩的 JSON Lines 日志"""
+
+    def __init__(self, path, source=None, flush_interval=FLUSH_INTERVAL, buffer_limit=BUFFER_LIMIT,
+                 max_bytes=MAX_BYTES, backups=BACKUPS):
+        self.path = path
+        self.source = source
+        self.flush_interval = flush_interval
+        self.buffer_limit = buffer_limit
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._buffer = []
+        self._lock = threading.Lock()
+        # 保证同一时刻只有一个线程在写文件 / 轮转
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"log-flusher:{os.path.basename(path)}",
+                                        daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(self, message, level=None, **fields):
+        """记一条日志 (只进缓冲区)，额外的关键字参数作为结构化字段写入
+
+        不指定 level 时按消息里的 [WARN] / [FAIL] / ❌ 等标记推断。
+        """
+        # 调用方只记原始内容，格式化和序列化留给刷盘线程
+        with self._lock:
+            self._buffer.append((time.time(), level, message, fields))
+            full = len(self._buffer) >= self.buffer_limit
+        if self._closed:
+            # 已关闭 (例如 atexit 之后仍有日志)，直接同步写
+            self.flush()
+        elif full:
+            self._wakeup.set()
+
+    def flush(self):
+        """把缓冲区写入文件，返回写入的条数"""
+        with self._write_lock:
+            with self._lock:
+                records, self._buffer = self._buffer, []
+            if not records:
+                return 0
+            data = "".join(self._format(*record) for record in records).encode("utf-8")
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                if self.max_bytes and os.path.exists(self.path) \
+                        and os.path.getsize(self.path) + len(data) > self.max_bytes:
+                    self._rotate()
+                with open(self.path, "ab") as f:
+                    f.write(data)
+            except OSError as e:
+                # 日志写不进去不能影响主流程，提示一次后丢弃这一批
+                print(f"[WARN] 日志写入失败 {self.path}: {e}", file=sys.stderr)
+                return 0
+            return len(records)
+
+    def _format(self, ts, level, message, fields):
+        record = {"ts": datetime.fromtimestamp(ts).isoformat(timespec="seconds"),
+                  "level": level or guess_level(message)}
+        if self.source:
+            record["source"] = self.source
+        record["msg"] = message
+        record.update(fields)
+        return json.dumps(record, ensure_ascii=False, default=str) + "\n"
+
+    def _rotate(self):
+        """<文件>.N.gz 依次后移，当前文件压缩为 <文件>.1.gz"""
+        for i in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{i}.gz"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{i + 1}.gz")
+        if self.backups > 0:
+            with open(self.path, "rb") as src, gzip.open(f"{self.path}.1.gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        os.remove(self.path)
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def close(self):
+        """停止后台线程并把剩余日志刷盘 (可重复调用)"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+
+_loggers = {}
+_loggers_lock = threading.Lock()
+
+
+def get_logger(path, source=None, **options):
+    """按文件路径取共享的 BufferedLogger，同一文件在进程内只有一个刷盘线程"""
+    key = os.path.abspath(path)
+    with _loggers_lock:
+        logger = _loggers.get(key)
+        if logger is None or logger._closed:
+            logger = _loggers[key] = BufferedLogger(path, source=source, **options)
+        return logger
+
+
+def read_log(path, limit=None):
+    """读回 JSON Lines 日志 (最近 limit 条)，兼容旧的纯文本行"""
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                records.append({"msg": line})
+    return records[-limit:] if limit else records
+
+
+def benchmark(lines=20000, path=None):
+    """对比逐行 open/append/close 与缓冲日志写 lines 行的耗时"""
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = os.path.join(tmp, "plain.log")
+        started = time.perf_counter()
+        for i in range(lines):
+            with open(plain, "a", encoding="utf-8") as f:
+                f.write(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] message {i}\n")
+        direct = time.perf_counter() - started
+
+        logger = BufferedLogger(path or os.path.join(tmp, "buffered.log"), source="bench")
+        started = time.perf_counter()
+        for i in range(lines):
+            logger.log(f"message {i}", seq=i)
+        enqueue = time.perf_counter() - started
+        logger.close()
+        total = time.perf_counter() - started
+
+    print(f"逐行写入   {lines} 行: {direct * 1000:8.1f} ms")
+    print(f"缓冲日志   {lines} 行: {enqueue * 1000:8.1f} ms (调用方)  {total * 1000:8.1f} ms (含刷盘)")
+    return {"direct": direct, "enqueue": enqueue, "total": total}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 20000)
+    elif len(sys.argv) > 2 and sys.argv[1] == "tail":
+        for record in read_log(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 20):
+            print(f"[{record.get('ts', '')}] {record.get('level', '')} {record.get('msg', '')}")
+    else:
+        print("用法: python buffered_log.py bench [行数] | tail <日志文件> [条数]")
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+持久化结果缓存 - 版本检查等慢操作的结果按 TTL 复用
+
+缓存是一个 JSON 文件：{键: {"value": ..., "at": 写入时间戳}}。
+get() 只返回未过期的值；peek() 连过期的也返回，配合 refresh_in_background()
+实现"先用旧结果，后台进程刷新"：同一个键同时只会有一个刷新进程
+(用 <缓存文件>.<键>.refresh 锁文件互斥，超过 REFRESH_LOCK_TTL 视为残留)。
+"""
+
+import os
+import sys
+import json
+import time
+import subprocess
+
+# 刷新锁的有效期 (秒)：刷新进程异常退出没删锁时，过期后允许重新刷新
+REFRESH_LOCK_TTL = 300
+
+
+class ResultCache:
+    """带 TTL 的持久化结果缓存"""
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def peek(self, key):
+        """返回 (值, 已缓存秒数)，不管是否过期；没有缓存时返回 (None, None)"""
+        entry = self._load().get(key)
+        if not isinstance(entry, dict) or "at" not in entry:
+            return None, None
+        return entry.get("value"), max(0.0, time.time() - entry["at"])
+
+    def get(self, key):
+        """未过期的缓存值，没有或已过期返回 None"""
+        value, age = self.peek(key)
+        if age is None or age > self.ttl:
+            return None
+        return value
+
+    def put(self, key, value):
+        """写入 (覆盖) 一个键，其他键保持不变"""
+        data = self._load()
+        data[key] = {"value": value, "at": time.time()}
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+    def _lock_path(self, key):
+        return f"{self.path}.{key}.refresh"
+
+    def begin_refresh(self, key):
+        """占用刷新锁，已有进程在刷新时返回 False"""
+        lock = self._lock_path(key)
+        try:
+            if time.time() - os.path.getmtime(lock) > REFRESH_LOCK_TTL:
+                os.remove(lock)
+        except OSError:
+            pass
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(os.getpid()))
+        return True
+
+    def end_refresh(self, key):
+        try:
+            os.remove(self._lock_path(key))
+        except OSError:
+            pass
+
+    def refresh_in_background(self, key, cmd):
+        """启动一个脱离当前进程的刷新进程 cmd (它结束时应调用 end_refresh)
+
+        已有刷新在进行时不重复启动，返回是否启动了新进程。
+        """
+        if not self.begin_refresh(key):
+            return False
+        options = {"stdin": subprocess.DEVNULL, "stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+        if sys.platform == "win32":
+            options["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            options["start_new_session"] = True
+        try:
+            subprocess.Popen(cmd, **options)
+        except OSError:
+            self.end_refresh(key)
+            return False
+        return True
@@ -8,15 +8,56 @@ import os
 import ssl
 ssl._create_default_https_context = ssl._create_unverified_context
 
+import sys
 import json
-import feedparser
-from datetime import datetime
-from pathlib import Path
+import time
+import hashlib
+import calendar
+import queue
+import threading
+import email.utils
+import urllib.error
+import urllib.request
+import xml.etree.ElementTree as ET
+try:
+    import feedparser
+except ImportError:
+    feedparser = None
+from datetime import datetime, timedelta
+from buffered_log import get_logger
 
 # ============== 配置 ==============
 WORKSPACE = "C:/Users/殇/.openclaw/workspace"
 RSS_DATA = f"{WORKSPACE}/rss_feed.json"
 RSS_LOG = f"{WORKSPACE}/rss_fetch.log"
+RSS_CACHE = f"{WORKSPACE}/rss_cache.json"
+RSS_ARTICLES = f"{WORKSPACE}/rss_articles"
+RSS_SCHEDULE = f"{WORKSPACE}/rss_schedule.json"
+
+# 并发抓取：工作线程数、单个源超时 (秒)、整体截止时间 (秒，到点后保存已完成的部分)
+FETCH_WORKERS = 4
+FEED_TIMEOUT = 10
+FETCH_DEADLINE = 30
+USER_AGENT = "OpenClaw-RSSFetcher/1.0"
+
+# 每个源每次最多处理的新文章数；文章库保留天数；保留的抓取批次数
+MAX_NEW_PER_FEED = 20
+ARTICLE_RETENTION_DAYS = 30
+ARTICLE_RUNS_KEPT = 20
+# rss_feed.json (以及据此生成的简报) 展示最近多少小时内抓到的新文章；这段时间没有新文章时退回最近一批
+BRIEFING_WINDOW_HOURS = 24
+
+# 自适应轮询：间隔上下限 (秒)、无更新时的退避倍数、估计更新间隔用的最近条目数
+MIN_POLL_INTERVAL = 5 * 60
+MAX_POLL_INTERVAL = 12 * 3600
+POLL_BACKOFF = 1.5
+POLL_SAMPLE_ENTRIES = 10
+# 解析方式："stream" 边下载边解析、读够 STREAM_MAX_ITEMS 条就断开；"feedparser" 整体下载后解析
+RSS_PARSER = "stream"
+STREAM_MAX_ITEMS = 50
+READ_CHUNK = 64 * 1024
+# sy:updatePeriod -> 秒
+SY_PERIODS = {"hourly": 3600, "daily": 86400, "weekly": 7 * 86400, "monthly": 30 * 86400, "yearly": 365 * 86400}
 
 # 科技 RSS 源
 RSS_FEEDS = [
@@ -62,41 +103,522 @@ RSS_FEEDS = [
     }
 ]
 
+class FeedTimeout(Exception):
+    """单个源超过超时时间"""
+
+
+def is_timeout(error):
+    """urllib / socket 的各种超时异常"""
+    if isinstance(error, urllib.error.URLError):
+        error = error.reason
+    return isinstance(error, (FeedTimeout, TimeoutError))
+
+
+def open_feed(url, timeout=FEED_TIMEOUT, etag=None, last_modified=None):
+    """发送请求，返回 (状态码, 响应, 响应头)
+
+    传入 etag / last_modified 时发送条件请求，未变化的源返回 (304, None, 响应头)。
+    """
+    headers = {"User-Agent": USER_AGENT}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return 304, None, e.headers
+        raise
+    return response.status, response, response.headers
+
+
+def response_socket(response):
+    """urllib 响应底层的 socket，取不到 (例如不是 HTTP 响应) 时返回 None"""
+    raw = getattr(getattr(response, "fp", None), "raw", None)
+    return getattr(raw, "_sock", None)
+
+
+def read_chunks(response, deadline, timeout=FEED_TIMEOUT):
+    """逐块读取响应体，超过 deadline (monotonic) 时抛出 FeedTimeout
+
+    服务端一点点往外吐数据时，固定的 socket 超时永远不会触发，read(n) 又要
+    攒满 n 字节才返回；这里每次读之前把 socket 超时设为剩余时间，并用
+    read1 有多少先拿多少，保证到点就放弃这个源。
+    """
+    sock = response_socket(response)
+    read = getattr(response, "read1", response.read)
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise FeedTimeout(f"超过 {timeout} 秒")
+        if sock is not None:
+            sock.settimeout(remaining)
+        try:
+            chunk = read(READ_CHUNK)
+        except TimeoutError:
+            raise FeedTimeout(f"超过 {timeout} 秒")
+        if not chunk:
+            return
+        yield chunk
+
+
+def download(url, timeout=FEED_TIMEOUT, etag=None, last_modified=None):
+    """下载 url，返回 (状态码, 原始字节, 响应头)
+
+    传入 etag / last_modified 时发送条件请求，未变化的源返回 (304, b"", 响应头)。
+    连接加读完超过 timeout 秒时抛出 FeedTimeout。
+    """
+    deadline = time.monotonic() + timeout
+    status, response, headers = open_feed(url, timeout, etag, last_modified)
+    if status == 304:
+        return 304, b"", headers
+    with response:
+        return status, b"".join(read_chunks(response, deadline, timeout)), headers
+
+
+# ============== 流式解析 ==============
+# 大的源 (几 MB、上千条) 用 feedparser 要先整体下载、再建完整的树；
+# 这里用 XMLPullParser 边收边解析，每条读完就从树上摘掉，
+# 够 max_items 条后直接返回，调用方随即关闭连接，剩下的字节不再下载。
+
+# 条目元素 (RSS 2.0 / RSS 1.0 的 item，Atom 的 entry)
+ITEM_TAGS = {"item", "entry"}
+# 频道级的更新提示 -> feedparser 中的键名
+CHANNEL_HINTS = {"ttl": "ttl", "updatePeriod": "sy_updateperiod", "updateFrequency": "sy_updatefrequency"}
+PUBLISHED_TAGS = {"pubDate", "published", "date", "issued"}
+SUMMARY_TAGS = {"description", "summary"}
+CONTENT_TAGS = {"encoded", "content"}
+
+
+class StreamedFeed:
+    """parse_stream 的结果：只保留抓取用到的字段，用法与 feedparser 的结果一致"""
+
+    def __init__(self):
+        self.feed = {}
+        self.entries = []
+        self.bozo = False
+        self.bozo_exception = None
+        # 读够 max_items 条后提前停止，后面可能还有条目
+        self.truncated = False
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+
+def local_name(tag):
+    """去掉命名空间：{http://www.w3.org/2005/Atom}entry -> entry"""
+    return tag.rsplit("}", 1)[-1]
+
+
+def parse_time(text):
+    """RFC 822 (RSS) 或 ISO 8601 (Atom / dc:date) 时间 -> UTC struct_time，解析不了返回 None"""
+    text = (text or "").strip()
+    if not text:
+        return None
+    try:
+        dt = email.utils.parsedate_to_datetime(text)
+    except (TypeError, ValueError, IndexError):
+        try:
+            dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    return dt.utctimetuple()
+
+
+def _entry_field(entry, name, elem, summary_chars):
+    """把条目的一个子元素记进 entry，键名与 feedparser 一致"""
+    text = (elem.text or "").strip()
+    if name == "title":
+        entry.setdefault("title", text)
+    elif name == "link":
+        # Atom: <link rel="alternate" href="..."/>；RSS: <link>...</link>
+        href = elem.get("href")
+        if href is None:
+            entry.setdefault("link", text)
+        elif elem.get("rel", "alternate") == "alternate":
+            entry.setdefault("link", href)
+    elif name in ("guid", "id"):
+        entry.setdefault("id", text)
+    elif name in PUBLISHED_TAGS:
+        if "published" not in entry:
+            entry["published"] = text
+            entry["published_parsed"] = parse_time(text)
+    elif name == "updated":
+        if "updated" not in entry:
+            entry["updated"] = text
+            entry["updated_parsed"] = parse_time(text)
+    elif name in SUMMARY_TAGS:
+        entry["summary"] = text[:summary_chars]
+    elif name in CONTENT_TAGS:
+        entry.setdefault("summary", text[:summary_chars])
+
+
+def parse_stream(chunks, max_items=None, summary_chars=200):
+    """增量解析 RSS / Atom 字节块，返回 StreamedFeed
+
+    chunks 为字节块的可迭代对象 (例如 read_chunks 的结果)。读够 max_items 条后
+    立即返回并标记 truncated，不再消费 chunks。XML 不合法时标记 bozo。
+    """
+    result = StreamedFeed()
+    parser = ET.XMLPullParser(events=("start", "end"))
+    stack = []
+    entry = None
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+            for event, elem in parser.read_events():
+                if event == "start":
+                    stack.append(elem)
+                    if entry is None and local_name(elem.tag) in ITEM_TAGS:
+                        entry = {}
+                    continue
+                stack.pop()
+                name = local_name(elem.tag)
+                if entry is None:
+                    if name in CHANNEL_HINTS:
+                        result.feed[CHANNEL_HINTS[name]] = (elem.text or "").strip()
+                    continue
+                if name not in ITEM_TAGS:
+                    _entry_field(entry, name, elem, summary_chars)
+                    continue
+                # 条目结束：记下并从树上摘掉，已解析的条目不占内存
+                result.entries.append(entry)
+                entry = None
+                if stack:
+                    stack[-1].remove(elem)
+                if max_items and len(result.entries) >= max_items:
+                    result.truncated = True
+                    return result
+        parser.close()
+    except ET.ParseError as e:
+        result.bozo = True
+        result.bozo_exception = e
+    return result
+
+
+def article_key(entry):
+    """文章去重键：优先用 GUID (feedparser 的 id)，否则用链接，取 sha1 前 16 位"""
+    ident = entry.get("id") or entry.get("guid") or entry.get("link") or entry.get("title", "")
+    return hashlib.sha1(ident.encode("utf-8")).hexdigest()[:16]
+
+
+class ArticleStore:
+    """按天分区的文章库
+
+    path/YYYY-MM-DD.jsonl 按抓取日期追加文章，path/index.json 保存
+        {"seen": {key: day}, "runs": [{"at": 时间, "new": {day: [key, ...]}}]}
+    seen 用于跨次运行去重，runs 记录每次有新文章的抓取新增了哪些文章
+    (没有新文章的抓取不记，免得把上一批挤出去)，用来回答 "最近几批 /
+    最近多久的新文章"。超过 ARTICLE_RETENTION_DAYS 天的分区和
+    去重键在提交时清理。线程安全，fetch_feed 可以并发调用；commit() 在锁内
+    完成过期清理并拍下索引快照，错过截止时间的抓取线程之后再 claim() 也
+    不会与它冲突 (这些文章没进快照，下次运行仍算新文章)。
+    """
+    
+    def __init__(self, path=None, retention_days=ARTICLE_RETENTION_DAYS):
+        self.path = path or RSS_ARTICLES
+        self.retention_days = retention_days
+        self.index_file = os.path.join(self.path, "index.json")
+        self.index = {"seen": {}, "runs": []}
+        self._pending = []
+        self._lock = threading.Lock()
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    self.index.update(json.load(f))
+            except ValueError:
+                pass
+    
+    def is_seen(self, key):
+        return key in self.index["seen"]
+    
+    def claim(self, key, article):
+        """没见过的 key 标记为已见、文章加入待提交列表并返回 True (同一批内的重复也只算一次)"""
+        with self._lock:
+            if key in self.index["seen"]:
+                return False
+            self.index["seen"][key] = datetime.now().strftime("%Y-%m-%d")
+            self._pending.append((key, article))
+            return True
+    
+    def commit(self):
+        """把本次新文章写入分区并记录本批次，返回新文章数"""
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).strftime("%Y-%m-%d")
+        with self._lock:
+            pending, self._pending = self._pending, []
+            new_by_day = {}
+            for key, article in pending:
+                new_by_day.setdefault(article["fetched_at"][:10], []).append((key, article))
+            if new_by_day:
+                self.index["runs"].append({
+                    "at": datetime.now().isoformat(),
+                    "new": {day: [key for key, _ in items] for day, items in new_by_day.items()}
+                })
+                self.index["runs"] = self.index["runs"][-ARTICLE_RUNS_KEPT:]
+            self.index["seen"] = {key: day for key, day in self.index["seen"].items() if day >= cutoff}
+            index_text = json.dumps(self.index, ensure_ascii=False)
+        
+        os.makedirs(self.path, exist_ok=True)
+        for day, items in new_by_day.items():
+            with open(os.path.join(self.path, f"{day}.jsonl"), 'a', encoding='utf-8') as f:
+                for key, article in items:
+                    f.write(json.dumps(dict(article, key=key), ensure_ascii=False) + "\n")
+        self._expire(cutoff)
+        
+        tmp = f"{self.index_file}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(index_text)
+        os.replace(tmp, self.index_file)
+        return len(pending)
+    
+    def _expire(self, cutoff):
+        """删除早于 cutoff (YYYY-MM-DD) 的分区"""
+        for name in os.listdir(self.path):
+            if name.endswith(".jsonl") and name[:10] < cutoff:
+                os.remove(os.path.join(self.path, name))
+    
+    def new_since_last_run(self, runs=1, since=None):
+        """最近 runs 批新增的文章 (按分区读取，不扫描整个库)
+
+        给了 since (ISO 时间字符串) 时改为取该时间之后的所有批次。
+        """
+        selected = self.index["runs"][-runs:] if since is None else \
+            [run for run in self.index["runs"] if run["at"] >= since]
+        wanted = {}
+        for run in selected:
+            for day, keys in run["new"].items():
+                wanted.setdefault(day, set()).update(keys)
+        
+        articles = []
+        for day in sorted(wanted):
+            partition = os.path.join(self.path, f"{day}.jsonl")
+            if not os.path.exists(partition):
+                continue
+            with open(partition, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        article = json.loads(line)
+                    except ValueError:
+                        continue
+                    if article.get("key") in wanted[day]:
+                        articles.append(article)
+        return articles
+
+
+def article_time(article):
+    """文章的发布时间 (epoch 秒)，没有或解析不了时用抓取时间"""
+    published = parse_time(article.get("published"))
+    if published is not None:
+        return calendar.timegm(published)
+    try:
+        return datetime.fromisoformat(article.get("fetched_at", "")).timestamp()
+    except ValueError:
+        return 0
+
+
+def feed_hint(parsed):
+    """源自己声明的最短刷新间隔 (秒)：<ttl> 分钟数或 sy:updatePeriod / sy:updateFrequency"""
+    hints = []
+    channel = parsed.get("feed", {})
+    try:
+        hints.append(int(channel["ttl"]) * 60)
+    except (KeyError, TypeError, ValueError):
+        pass
+    period = SY_PERIODS.get(str(channel.get("sy_updateperiod", "")).strip().lower())
+    if period:
+        try:
+            frequency = max(1, int(channel.get("sy_updatefrequency", 1)))
+        except (TypeError, ValueError):
+            frequency = 1
+        hints.append(period / frequency)
+    return max(hints) if hints else None
+
+
+def entry_times(entries):
+    """条目的发布/更新时间 (epoch 秒)"""
+    times = []
+    for entry in entries:
+        parsed_time = entry.get("published_parsed") or entry.get("updated_parsed")
+        if parsed_time:
+            times.append(calendar.timegm(parsed_time))
+    return times
+
+
+class FeedScheduler:
+    """按源自适应的轮询计划
+
+    每个源保存 {"learned", "hint", "idle", "interval", "next_poll", "last_polled"}:
+    - learned: 从最近 POLL_SAMPLE_ENTRIES 个条目时间间隔的中位数估计出的
+      更新周期 (与上次估计做平滑)；
+    - hint: 源声明的 ttl / sy:updatePeriod，作为间隔下限；
+    - idle: 连续没有新文章 (或失败) 的次数，间隔按 POLL_BACKOFF ** idle 退避；
+    间隔限制在 MIN_POLL_INTERVAL ~ MAX_POLL_INTERVAL 之间。
+    """
+    
+    def __init__(self, path=None):
+        self.path = path or RSS_SCHEDULE
+        self.state = {}
+        self._lock = threading.Lock()
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.state = json.load(f)
+            except ValueError:
+                pass
+    
+    def due(self, feed, now=None):
+        now = time.time() if now is None else now
+        return self.state.get(feed['url'], {}).get("next_poll", 0) <= now
+    
+    def next_poll(self, feed):
+        return self.state.get(feed['url'], {}).get("next_poll", 0)
+    
+    def update(self, feed, new_count, times=(), hint=None, failed=False, now=None):
+        """记录一次轮询结果并安排下一次，返回新的间隔 (秒)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            state = self.state.setdefault(feed['url'], {"learned": None, "hint": None, "idle": 0})
+            
+            recent = sorted(times, reverse=True)[:POLL_SAMPLE_ENTRIES]
+            gaps = sorted(a - b for a, b in zip(recent, recent[1:]) if a > b)
+            if gaps:
+                estimate = gaps[len(gaps) // 2]
+                state["learned"] = estimate if not state["learned"] else 0.5 * state["learned"] + 0.5 * estimate
+            if hint:
+                state["hint"] = hint
+            state["idle"] = 0 if new_count and not failed else state["idle"] + 1
+            
+            base = max(state["learned"] or MIN_POLL_INTERVAL, state["hint"] or 0, MIN_POLL_INTERVAL)
+            interval = min(MAX_POLL_INTERVAL, base * POLL_BACKOFF ** state["idle"])
+            state["interval"] = round(interval)
+            state["last_polled"] = now
+            state["next_poll"] = now + interval
+            return interval
+    
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with self._lock:
+            text = json.dumps(self.state, ensure_ascii=False, indent=2)
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, self.path)
+
+
 class RSSFetcher:
-    """RSS 抓取器"""
+    """RSS 抓取器
+
+    fetch_all() 默认用 FETCH_WORKERS 个线程并发抓取，每个源最多
+    feed_timeout 秒，整体超过 deadline 秒后不再等待，直接保存已完成的
+    源。每个源的耗时和状态 (ok / cached / timeout / error / deadline) 记在
+    self.latency 中，并随结果一起保存。
     
-    def __init__(self):
-        self.feeds = RSS_FEEDS
+    每个源的 ETag / Last-Modified 和上次解析出的条目保存在 RSS_CACHE，
+    下次以条件请求抓取；服务端返回 304 时直接复用缓存的结果，不再下载
+    和解析。命中率写入 rss_fetch.log。
+    
+    文章按 GUID / 链接去重 (ArticleStore)：结果里只包含以前没见过的文章，
+    fetch_feed 只为它们生成摘要，并在 fetch_all 结束时写入文章库。
+    rss_feed.json 的 feeds 则取自文章库 (recent_feeds)：最近
+    BRIEFING_WINDOW_HOURS 小时的新文章，包括这次没到期、没抓取的源。
+    
+    fetch_all 只抓取到期的源 (FeedScheduler)，force=True 时全部抓取。
+    """
+    
+    def __init__(self, feeds=None, feed_timeout=FEED_TIMEOUT, data_file=None, cache_file=None,
+                 article_dir=None, schedule_file=None, parser=RSS_PARSER, max_items=STREAM_MAX_ITEMS):
+        self.feeds = feeds if feeds is not None else RSS_FEEDS
+        self.feed_timeout = feed_timeout
+        # 没装 feedparser 时只能用流式解析
+        self.parser = parser if feedparser is not None else "stream"
+        self.max_items = max_items
+        self.data_file = data_file or RSS_DATA
+        self.cache_file = cache_file or RSS_CACHE
         self.results = []
+        self.latency = {}
+        self.partial = False
+        self.cache = self.load_cache()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # 本轮下载的字节数与工作线程的 CPU 时间 (串行抓取时算在调用线程上，由调用方统计)
+        self.bytes_fetched = 0
+        self.worker_cpu_time = 0.0
+        self._stats_lock = threading.Lock()
+        self.articles = ArticleStore(article_dir)
+        self.scheduler = FeedScheduler(schedule_file)
         self.start_time = datetime.now()
+        self.logger = get_logger(RSS_LOG, "rss_fetcher")
     
     def log(self, message):
-        """日志记录"""
+        """日志记录 (写入缓冲，由后台线程刷盘)"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"[{timestamp}] {message}\n"
-        
-        with open(RSS_LOG, 'a', encoding='utf-8', errors='ignore') as f:
-            f.write(log_entry)
+        self.logger.log(message)
         
         # 移除 emoji 避免编码问题
         clean_message = message.replace("✅", "[OK]").replace("❌", "[FAIL]").replace("⚠️", "[WARN]")
         print(f"[{timestamp}] {clean_message}")
     
+    def load_cache(self):
+        """加载条件请求缓存 {url: {"etag", "last_modified", "entries", "cached_at"}}"""
+        if not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except ValueError:
+            return {}
+    
+    def save_cache(self):
+        tmp = f"{self.cache_file}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            # 截止时间后仍在运行的抓取线程可能还会写入，先复制一份
+            json.dump(dict(self.cache), f, ensure_ascii=False)
+        os.replace(tmp, self.cache_file)
+    
+    def _record_latency(self, feed, started, status):
+        self.latency[feed['name']] = {
+            "latency": round(time.perf_counter() - started, 3),
+            "status": status
+        }
+    
     def fetch_feed(self, feed):
         """抓取单个 RSS 源"""
+        started = time.perf_counter()
         try:
             self.log(f"抓取: {feed['name']}...")
             
-            # 解析 RSS
-            parsed = feedparser.parse(feed['url'])
+            # 先带超时 (以及缓存的校验值) 下载，再解析 RSS
+            cached = self.cache.get(feed['url'], {})
+            status, parsed, headers = self._fetch_parsed(feed['url'], cached.get("etag"),
+                                                         cached.get("last_modified"))
+            if status == 304:
+                if "entries" in cached:
+                    self.cache_hits += 1
+                    return self._cached_result(feed, cached, started)
+                # 缓存格式不对，退回无条件请求
+                status, parsed, headers = self._fetch_parsed(feed['url'])
+            self.cache_misses += 1
             
             if parsed.bozo:
                 self.log(f"  [WARN] 解析错误: {parsed.bozo_exception}")
+                self._record_latency(feed, started, "error")
+                self.scheduler.update(feed, 0, failed=True)
                 return None
             
-            # 提取文章
+            # 提取文章：已见过的直接跳过，只为新文章生成摘要
             articles = []
-            for entry in parsed.entries[:5]:  # 每个源取前5条
+            capped = False
+            unseen_tail = False
+            for entry in parsed.entries:
+                key = article_key(entry)
+                if self.articles.is_seen(key):
+                    unseen_tail = False
+                    continue
+                unseen_tail = True
+                if len(articles) >= MAX_NEW_PER_FEED:
+                    capped = True
+                    break
                 article = {
                     "title": entry.get("title", ""),
                     "link": entry.get("link", ""),
@@ -106,36 +628,131 @@ class RSSFetcher:
                     "category": feed['category'],
                     "fetched_at": datetime.now().isoformat()
                 }
+                if not self.articles.claim(key, article):
+                    continue
                 articles.append(article)
             
-            self.log(f"  [OK] 获取 {len(articles)} 篇文章")
+            # 流式解析提前停下且最后一条仍是新的，后面可能还有没读到的新条目
+            if parsed.get("truncated") and unseen_tail:
+                capped = True
+            # 新文章超过上限时不记校验值，下次完整抓取以处理剩下的条目
+            if capped:
+                self.cache.pop(feed['url'], None)
+            elif headers.get("ETag") or headers.get("Last-Modified"):
+                self.cache[feed['url']] = {
+                    "etag": headers.get("ETag"),
+                    "last_modified": headers.get("Last-Modified"),
+                    "entries": len(parsed.entries),
+                    "cached_at": datetime.now().isoformat()
+                }
+            
+            interval = self.scheduler.update(feed, len(articles), entry_times(parsed.entries), feed_hint(parsed))
+            self._record_latency(feed, started, "ok")
+            self.log(f"  [OK] {feed['name']} 新文章 {len(articles)} 篇 (共 {len(parsed.entries)} 条) "
+                     f"({self.latency[feed['name']]['latency']:.2f}秒，{interval / 60:.0f} 分钟后再抓)")
             
             return {
                 "source": feed['name'],
                 "category": feed['category'],
                 "url": feed['url'],
                 "articles": articles,
-                "fetched_at": datetime.now().isoformat()
+                "fetched_at": datetime.now().isoformat(),
+                "latency": self.latency[feed['name']]['latency']
             }
             
         except Exception as e:
-            self.log(f"  [FAIL] 失败: {e}")
+            status = "timeout" if is_timeout(e) else "error"
+            self._record_latency(feed, started, status)
+            self.scheduler.update(feed, 0, failed=True)
+            self.log(f"  [FAIL] {feed['name']} {'超时' if status == 'timeout' else '失败'}: {e}")
             return None
     
-    def fetch_all(self):
-        """抓取所有 RSS 源"""
+    def _fetch_parsed(self, url, etag=None, last_modified=None):
+        """下载并解析，返回 (状态码, 解析结果, 响应头)；304 时解析结果为 None"""
+        deadline = time.monotonic() + self.feed_timeout
+        status, response, headers = open_feed(url, self.feed_timeout, etag, last_modified)
+        if status == 304:
+            return 304, None, headers
+        with response:
+            if self.parser != "stream":
+                body = b"".join(read_chunks(response, deadline, self.feed_timeout))
+                self._count_bytes(len(body))
+                return status, feedparser.parse(body), headers
+            consumed = []
+
+            def tee():
+                for chunk in read_chunks(response, deadline, self.feed_timeout):
+                    consumed.append(chunk)
+                    yield chunk
+
+            try:
+                parsed = parse_stream(tee(), self.max_items)
+                if parsed.bozo and feedparser is not None:
+                    # 不是合法 XML (例如用了 HTML 实体)，读完剩下的交给更宽松的 feedparser
+                    consumed.extend(read_chunks(response, deadline, self.feed_timeout))
+                    parsed = feedparser.parse(b"".join(consumed))
+            finally:
+                self._count_bytes(sum(len(chunk) for chunk in consumed))
+            return status, parsed, headers
+    
+    def _count_bytes(self, n):
+        with self._stats_lock:
+            self.bytes_fetched += n
+    
+    def _fetch_timed(self, feed):
+        """工作线程里抓取一个源，并累计该线程的 CPU 时间"""
+        cpu_started = time.thread_time()
+        try:
+            return self.fetch_feed(feed)
+        finally:
+            with self._stats_lock:
+                self.worker_cpu_time += time.thread_time() - cpu_started
+    
+    def _cached_result(self, feed, cached, started):
+        """304 未修改：复用上次解析的结果，上次的条目都已在文章库里，没有新文章"""
+        self.scheduler.update(feed, 0)
+        self._record_latency(feed, started, "cached")
+        self.log(f"  [OK] {feed['name']} 未更新 (304)，跳过 {cached['entries']} 条已见条目")
+        return {
+            "source": feed['name'],
+            "category": feed['category'],
+            "url": feed['url'],
+            "articles": [],
+            "fetched_at": datetime.now().isoformat(),
+            "latency": self.latency[feed['name']]['latency'],
+            "cached": True
+        }
+    
+    def fetch_all(self, concurrent=True, workers=FETCH_WORKERS, deadline=FETCH_DEADLINE, force=False):
+        """抓取到期的 RSS 源 (force=True 时全部抓取)，concurrent=False 时逐个抓取"""
         self.log("="*60)
         self.log("RSS Feed Fetcher - 科技源抓取")
         self.log(f"启动时间: {self.start_time.isoformat()}")
         self.log(f"源数量: {len(self.feeds)}")
         self.log("="*60)
         
-        results = []
+        feeds = self.feeds
+        if not force:
+            now = time.time()
+            feeds = []
+            for feed in self.feeds:
+                if self.scheduler.due(feed, now):
+                    feeds.append(feed)
+                else:
+                    wait_minutes = (self.scheduler.next_poll(feed) - now) / 60
+                    self.log(f"跳过: {feed['name']} (未到期，{wait_minutes:.0f} 分钟后)")
         
-        for feed in self.feeds:
-            result = self.fetch_feed(feed)
-            if result:
-                results.append(result)
+        self.partial = False
+        if concurrent:
+            by_index = self._fetch_concurrent(feeds, workers, deadline)
+        else:
+            by_index = self._fetch_serial(feeds, deadline)
+        
+        # 按 RSS_FEEDS 的顺序输出
+        results = [by_index[i] for i in sorted(by_index) if by_index[i]]
+        self.save_cache()
+        self.articles.commit()
+        self.scheduler.save()
         
         # 保存结果
         self.save_results(results)
@@ -146,32 +763,133 @@ class RSSFetcher:
         
         self.log("="*60)
         self.log(f"抓取完成! 耗时: {duration:.2f}秒")
-        self.log(f"成功: {len(results)}/{len(self.feeds)} 个源")
+        self.log(f"成功: {len(results)}/{len(feeds)} 个到期的源 (共 {len(self.feeds)} 个)")
         self.log(f"文章总数: {sum(len(r['articles']) for r in results)}")
+        requests = self.cache_hits + self.cache_misses
+        self.log(f"条件请求: 命中 {self.cache_hits} / 未命中 {self.cache_misses} "
+                 f"(命中率 {self.cache_hits / requests if requests else 0:.0%})")
+        slowest = sorted(self.latency.items(), key=lambda x: x[1]["latency"], reverse=True)[:3]
+        self.log("最慢: " + ", ".join(f"{name} {info['latency']:.2f}秒 ({info['status']})"
+                                      for name, info in slowest))
         self.log("="*60)
+        # 一轮抓取结束，把这一轮的日志一次写盘
+        self.logger.flush()
         
         return results
     
+    def _fetch_concurrent(self, feeds, workers, deadline):
+        """workers 个守护线程并发抓取，返回 {源序号: 结果}
+
+        不用 ThreadPoolExecutor：它的线程在解释器退出时会被 join，卡住的
+        请求会拖住退出。到了截止时间直接返回，守护线程不再领新任务，
+        还在跑的请求受单源超时约束，结果被丢弃。
+        """
+        by_index = {}
+        started = time.perf_counter()
+        end = time.monotonic() + deadline
+        todo = queue.Queue()
+        for item in enumerate(feeds):
+            todo.put(item)
+        done = queue.Queue()
+        
+        def worker():
+            while time.monotonic() < end:
+                try:
+                    i, feed = todo.get_nowait()
+                except queue.Empty:
+                    return
+                done.put((i, self._fetch_timed(feed)))
+        
+        for n in range(min(workers, len(feeds))):
+            threading.Thread(target=worker, name=f"rss-fetch-{n}", daemon=True).start()
+        while len(by_index) < len(feeds):
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                i, result = done.get(timeout=remaining)
+            except queue.Empty:
+                break
+            by_index[i] = result
+        
+        pending = [feed for i, feed in enumerate(feeds) if i not in by_index]
+        if pending:
+            self._mark_deadline(pending, started, deadline)
+        return by_index
+    
+    def _fetch_serial(self, feeds, deadline):
+        by_index = {}
+        started = time.perf_counter()
+        for i, feed in enumerate(feeds):
+            if time.perf_counter() - started > deadline:
+                self._mark_deadline(feeds[i:], started, deadline)
+                break
+            by_index[i] = self.fetch_feed(feed)
+        return by_index
+    
+    def _mark_deadline(self, feeds, started, deadline):
+        self.partial = True
+        for feed in feeds:
+            self.latency[feed['name']] = {
+                "latency": round(time.perf_counter() - started, 3),
+                "status": "deadline"
+            }
+        self.log(f"[WARN] 超过整体截止时间 {deadline} 秒，保存部分结果，"
+                 f"未完成: {', '.join(feed['name'] for feed in feeds)}")
+    
+    def recent_feeds(self, hours=BRIEFING_WINDOW_HOURS):
+        """文章库里最近 hours 小时的新文章 (没有则取最近一批)，按源分组，每个源里新的在前
+
+        不管这次抓了哪些源、有没有新文章，都从文章库取，未到期的源和
+        没有新文章的启动不会让简报变空。
+        """
+        since = (datetime.now() - timedelta(hours=hours)).isoformat()
+        articles = self.articles.new_since_last_run(since=since) or self.articles.new_since_last_run(1)
+        articles.sort(key=article_time, reverse=True)
+        
+        by_source = {}
+        for article in articles:
+            by_source.setdefault(article.get("source", ""), []).append(
+                {k: v for k, v in article.items() if k != "key"})
+        feeds = []
+        # 按 RSS_FEEDS 的顺序输出，已从配置里删掉的源排在最后
+        order = {feed['name']: i for i, feed in enumerate(self.feeds)}
+        for source in sorted(by_source, key=lambda name: order.get(name, len(order))):
+            items = by_source[source]
+            feed = next((f for f in self.feeds if f['name'] == source), {})
+            feeds.append({
+                "source": source,
+                "category": items[0].get("category", feed.get("category", "")),
+                "url": feed.get("url", ""),
+                "articles": items
+            })
+        return feeds
+    
     def save_results(self, results):
-        """保存抓取结果"""
+        """保存抓取结果：本次抓取的统计 + recent_feeds() 的最近文章"""
+        feeds = self.recent_feeds()
         data = {
             "fetched_at": datetime.now().isoformat(),
-            "sources_count": len(results),
-            "total_articles": sum(len(r['articles']) for r in results),
-            "feeds": results
+            "sources_count": len(feeds),
+            "total_articles": sum(len(f['articles']) for f in feeds),
+            "fetched_sources": len(results),
+            "new_articles": sum(len(r['articles']) for r in results),
+            "partial": self.partial,
+            "latency": self.latency,
+            "feeds": feeds
         }
         
-        with open(RSS_DATA, 'w', encoding='utf-8', errors='ignore') as f:
+        with open(self.data_file, 'w', encoding='utf-8', errors='ignore') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
         
-        self.log(f"结果已保存到: {RSS_DATA}")
+        self.log(f"结果已保存到: {self.data_file}")
     
     def get_summary(self):
         """获取摘要"""
-        if not os.path.exists(RSS_DATA):
+        if not os.path.exists(self.data_file):
             return None
         
-        with open(RSS_DATA, 'r', encoding='utf-8') as f:
+        with open(self.data_file, 'r', encoding='utf-8') as f:
             data = json.load(f)
         
         summary = f"""
@@ -192,10 +910,167 @@ class RSSFetcher:
         return summary
 
 
-def main():
-    """主入口"""
-    fetcher = RSSFetcher()
-    results = fetcher.fetch_all()
+# ============== 本地替身服务器 ==============
+def make_fixture_feed(items=20, summary_chars=200, title="Stand-in Feed"):
+    """生成 RSS 2.0 测试文档 (bytes)"""
+    parts = [
+        '<?xml version="1.0" encoding="utf-8"?>\n<rss version="2.0"><channel>'
+        f'<title>{title}</title><link>http://127.0.0.1/</link><description>fixture</description>'
+    ]
+    for i in range(items):
+        parts.append(
+            f'<item><title>{title} item {i}</title>'
+            f'<link>http://127.0.0.1/{title.replace(" ", "-")}/{i}</link>'
+            f'<guid>{title}-{i}</guid>'
+            f'<pubDate>Mon, 12 Oct 2026 {i % 24:02d}:00:00 GMT</pubDate>'
+            f'<description>{("lorem ipsum " * (summary_chars // 12 + 1))[:summary_chars]}</description></item>'
+        )
+    parts.append('</channel></rss>')
+    return "".join(parts).encode('utf-8')
+
+
+def start_stand_in(routes):
+    """启动本地 RSS 替身服务器
+
+    routes: {路径: (响应字节, 延迟秒)}，响应带 ETag，命中 If-None-Match 时返回
+    304。返回 (server, base_url)，用完调用 server.shutdown()。
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body, delay = routes.get(self.path, (None, 0))
+            time.sleep(delay)
+            if body is None:
+                self.send_error(404)
+                return
+            etag = '"%x"' % (hash(body) & 0xffffffff)
+            try:
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", "application/rss+xml; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def run_stand_in(fast=6, slow_delay=1.5, hang_delay=30, feed_timeout=2.0, deadline=4.0):
+    """用本地替身服务器对比串行 / 并发抓取：若干快源、一个慢源、一个挂起的源
+
+    两次抓取共用一份条件请求缓存，第二次 (并发) 的源应返回 304 命中缓存。
+    """
+    import tempfile
+    
+    routes = {f"/fast{i}": (make_fixture_feed(title=f"Fast {i}"), 0.05) for i in range(fast)}
+    routes["/slow"] = (make_fixture_feed(title="Slow"), slow_delay)
+    routes["/hang"] = (make_fixture_feed(title="Hang"), hang_delay)
+    server, base = start_stand_in(routes)
+    feeds = [{"name": path.strip("/"), "url": base + path, "category": "测试"} for path in routes]
+    
+    timings = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for mode in ("serial", "concurrent"):
+                fetcher = RSSFetcher(feeds, feed_timeout=feed_timeout,
+                                     data_file=os.path.join(tmp, f"{mode}.json"),
+                                     cache_file=os.path.join(tmp, "cache.json"),
+                                     article_dir=os.path.join(tmp, "articles"),
+                                     schedule_file=os.path.join(tmp, "schedule.json"))
+                started = time.perf_counter()
+                results = fetcher.fetch_all(concurrent=(mode == "concurrent"), deadline=deadline, force=True)
+                timings[mode] = {
+                    "elapsed": time.perf_counter() - started,
+                    "feeds": len(results),
+                    "partial": fetcher.partial,
+                    "cache_hits": fetcher.cache_hits,
+                    "new_articles": sum(len(r["articles"]) for r in results),
+                    "latency": fetcher.latency
+                }
+    finally:
+        server.shutdown()
+    
+    for mode, t in timings.items():
+        print(f"{mode:10s} 耗时 {t['elapsed']:.2f}秒  成功 {t['feeds']}/{len(feeds)}  "
+              f"部分结果: {t['partial']}  缓存命中: {t['cache_hits']}  新文章: {t['new_articles']}")
+        for name, info in t["latency"].items():
+            print(f"    {name:8s} {info['latency']:6.2f}秒  {info['status']}")
+    return timings
+
+
+def benchmark_parse(items=3000, summary_chars=2000, max_items=STREAM_MAX_ITEMS, repeats=3):
+    """对比大源的解析耗时与内存峰值：feedparser / 流式解析全部 / 流式解析前 max_items 条
+
+    文档预先生成在内存里，按 READ_CHUNK 切块喂给流式解析 (模拟边下边解析)；
+    耗时取 repeats 次中最快的一次，内存峰值用 tracemalloc 单独测一次。
+    没装 feedparser 时跳过这一项。
+    """
+    import tracemalloc
+    
+    body = make_fixture_feed(items=items, summary_chars=summary_chars, title="Bench")
+    chunks = [body[i:i + READ_CHUNK] for i in range(0, len(body), READ_CHUNK)]
+    cases = []
+    if feedparser is not None:
+        cases.append(("feedparser", lambda: feedparser.parse(body)))
+    else:
+        print("未安装 feedparser，跳过对比项")
+    cases.append(("stream 全部", lambda: parse_stream(chunks)))
+    cases.append((f"stream 前 {max_items} 条", lambda: parse_stream(chunks, max_items)))
+    
+    print(f"文档 {len(body) / 1024 / 1024:.1f} MB，{items} 条，摘要 {summary_chars} 字符")
+    report = {}
+    for name, run in cases:
+        best = None
+        for _ in range(repeats):
+            started = time.perf_counter()
+            parsed = run()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        tracemalloc.start()
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        report[name] = {"seconds": best, "peak_bytes": peak, "entries": len(parsed.entries)}
+        print(f"  {name:16s} {best * 1000:8.1f} ms  峰值 {peak / 1024 / 1024:7.2f} MB  条目 {len(parsed.entries)}")
+    return report
+
+
+def main(argv=None):
+    """主入口
+
+    python rss_fetcher.py               抓取到期的源
+    python rss_fetcher.py --all         忽略轮询计划，抓取全部源
+    python rss_fetcher.py --serial      逐个抓取
+    python rss_fetcher.py --feedparser  用 feedparser 整体解析 (默认流式解析)
+    python rss_fetcher.py stand-in      用本地替身服务器 (快/慢/挂起的源) 对比串行与并发
+    python rss_fetcher.py bench-parse [条目数] [摘要字符数]
+                                        对比大源的解析耗时与内存峰值
+    """
+    argv = argv if argv is not None else sys.argv
+    command = argv[1] if len(argv) > 1 else None
+    
+    if command == "stand-in":
+        return run_stand_in()
+    if command == "bench-parse":
+        numbers = [int(a) for a in argv[2:4]]
+        return benchmark_parse(*numbers)
+    
+    fetcher = RSSFetcher(parser="feedparser" if "--feedparser" in argv else RSS_PARSER)
+    results = fetcher.fetch_all(concurrent="--serial" not in argv, force="--all" in argv)
     return results
 
 
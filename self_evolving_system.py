@@ -9,17 +9,35 @@ import json
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from self_evolving_v2 import (
+    HEALTH_DEFAULT_WINDOW, DecayingCounters, FileLock, KeywordMatcher,
+    atomic_write_text, build_rollups, count_error_types, merge_counts, replay_journal
+)
+
 # ============== 配置 ==============
 WORKSPACE = "C:/Users/殇/.openclaw/workspace"
 LEARNING_DATA = f"{WORKSPACE}/learning_data.json"
 ERROR_LOG = f"{WORKSPACE}/error_patterns.json"
 IMPROVEMENTS = f"{WORKSPACE}/improvements.json"
+LEARNING_LOCK = f"{WORKSPACE}/learning_data.lock"
+LEARNING_JOURNAL = f"{WORKSPACE}/learning_data.journal"
 
 # ============== 数据结构 ==============
 class LearningData:
-    """学习数据结构"""
+    """学习数据结构
+
+    传入 store (SQLiteLearningStore) 时记录写入 SQLite，统计走 GROUP BY。
+    
+    与 v2 的 LearningDatabase 共用同一把文件锁；加载和保存时都读取
+    快照并回放 v2 的追加日志 (LEARNING_JOURNAL)，保存时只把本进程新增的
+    记录追加上去，再原子替换快照并清空日志 (日志已并入快照，相当于一次
+    v2 的压缩)。新增记录同时计入 data["rollups"] (见 v2 的 build_rollups)，
+    统计直接读汇总。
+    """
     
-    def __init__(self):
+    def __init__(self, store=None):
+        self.store = store
+        self.lock = FileLock(LEARNING_LOCK)
         self.data = {
             "version": "1.0",
             "created_at": datetime.now().isoformat(),
@@ -37,46 +55,96 @@ class LearningData:
         
         # 加载现有数据
         self.load()
+        self._persisted_lengths = {
+            key: len(self.data[key]) for key in ("error_patterns", "success_patterns")
+        }
     
     def load(self):
         """加载学习数据"""
+        if self.store is not None:
+            self.data["metrics"].update(self.store.load_metrics())
+            return
+        
+        with self.lock:
+            loaded = self._read_disk()
+        self.data.update(loaded)
+    
+    def _read_disk(self):
+        """读取 快照 + v2 日志，调用方需持有文件锁"""
+        data = {}
         if os.path.exists(LEARNING_DATA):
             try:
                 with open(LEARNING_DATA, 'r', encoding='utf-8') as f:
-                    loaded = json.load(f)
-                    self.data.update(loaded)
-            except:
-                pass
+                    data = json.load(f)
+            except ValueError as e:
+                # 损坏的文件挪到一边，免得保存时把历史覆盖掉
+                backup = f"{LEARNING_DATA}.corrupt-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+                os.replace(LEARNING_DATA, backup)
+                print(f"[LearningData] 学习数据损坏，已移动到 {backup}: {e}")
+        replay_journal(data, path=LEARNING_JOURNAL)
+        return data
     
     def save(self):
         """保存学习数据"""
         self.data["last_updated"] = datetime.now().isoformat()
-        with open(LEARNING_DATA, 'w', encoding='utf-8') as f:
-            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        
+        if self.store is not None:
+            for key, start in self._persisted_lengths.items():
+                self.store.append_records(key, self.data[key][start:])
+                self._persisted_lengths[key] = len(self.data[key])
+            self.store.set_metrics(self.data["metrics"])
+            self.store.commit()
+            return
+        
+        with self.lock:
+            # 其他进程可能在本进程加载之后写过，以磁盘版本为底合并
+            merged = self._read_disk()
+            added = {key: self.data[key][start:] for key, start in self._persisted_lengths.items()}
+            for key, start in self._persisted_lengths.items():
+                merged[key] = merged.get(key, self.data[key][:start]) + added[key]
+                self._persisted_lengths[key] = len(merged[key])
+            for key, value in self.data.items():
+                # 指标、滑动窗口和汇总计数由 v2 增量维护，以磁盘为准
+                if key not in self._persisted_lengths and key not in ("metrics", "health_windows", "rollups"):
+                    merged[key] = value
+            if "rollups" in merged:
+                merge_counts(merged["rollups"], build_rollups(added))
+            else:
+                merged["rollups"] = build_rollups(merged)
+            merged.setdefault("metrics", self.data["metrics"])
+            atomic_write_text(LEARNING_DATA, json.dumps(merged, ensure_ascii=False, indent=2))
+            if os.path.exists(LEARNING_JOURNAL):
+                # 日志已回放进快照，清空以免 v2 再回放一遍
+                open(LEARNING_JOURNAL, 'w', encoding='utf-8').close()
+        self.data = merged
+    
+    def error_type_counts(self):
+        """按错误类型统计次数，返回 [(type, count), ...]，按次数降序"""
+        if self.store is not None:
+            return self.store.error_type_counts()
+        if "rollups" in self.data:
+            return sorted(self.data["rollups"]["types"].items(), key=lambda x: x[1], reverse=True)
+        return count_error_types(self.data.get("error_patterns", []))
 
 # ============== Phase 1: 错误分析 ==============
 class ErrorAnalyzer:
     """错误模式分析器"""
     
+    PATTERNS = {
+        "network": ["timeout", "connection", "network", "internet"],
+        "api": ["api", "401", "403", "404", "rate limit"],
+        "file": ["file", "path", "permission", "not found"],
+        "memory": ["memory", "out of", "overflow"],
+        "encoding": ["encoding", "utf-8", "unicode", "gbk"]
+    }
+    MATCHER = KeywordMatcher(PATTERNS)
+    
     @staticmethod
     def analyze_error(error_msg, context=None):
         """分析错误并提取模式"""
-        patterns = {
-            "network": ["timeout", "connection", "network", "internet"],
-            "api": ["api", "401", "403", "404", "rate limit"],
-            "file": ["file", "path", "permission", "not found"],
-            "memory": ["memory", "out of", "overflow"],
-            "encoding": ["encoding", "utf-8", "unicode", "gbk"]
-        }
-        
-        error_lower = error_msg.lower()
-        detected_patterns = []
-        
-        for pattern_type, keywords in patterns.items():
-            for keyword in keywords:
-                if keyword in error_lower:
-                    detected_patterns.append(pattern_type)
-                    break
+        detected_patterns = [
+            pattern_type for pattern_type, _ in ErrorAnalyzer.MATCHER.match(error_msg)
+        ]
         
         return {
             "error_msg": error_msg,
@@ -146,14 +214,8 @@ class ImprovementGenerator:
         """基于学习数据生成改进建议"""
         improvements = []
         
-        # 基于错误模式生成建议
-        error_counts = {}
-        for error in learning_data.data.get("error_patterns", []):
-            for p in error.get("patterns", []):
-                error_counts[p] = error_counts.get(p, 0) + 1
-        
-        # 常见错误优先处理
-        sorted_errors = sorted(error_counts.items(), key=lambda x: x[1], reverse=True)
+        # 基于错误模式生成建议，常见错误优先处理
+        sorted_errors = learning_data.error_type_counts()
         
         for error_type, count in sorted_errors[:3]:
             improvements.append({
@@ -257,20 +319,38 @@ class SelfEvaluator:
         """评估系统表现"""
         metrics = learning_data.data.get("metrics", {})
         
+        if learning_data.store is not None:
+            error_count = learning_data.store.record_counts()["errors"]
+        else:
+            error_count = len(learning_data.data.get("error_patterns", []))
+        
         return {
             "success_rate": metrics.get("success_rate", 0.0),
             "total_tasks": metrics.get("total_tasks", 0),
-            "error_count": len(learning_data.data.get("error_patterns", [])),
+            "error_count": error_count,
             "improvement_count": len(learning_data.data.get("improvements", [])),
-            "health_score": SelfEvaluator.calculate_health(metrics)
+            "health_score": SelfEvaluator.calculate_health(
+                metrics, learning_data.data.get("health_windows"))
         }
     
     @staticmethod
-    def calculate_health(metrics):
-        """计算健康分数"""
+    def calculate_health(metrics, windows=None, window=HEALTH_DEFAULT_WINDOW, now=None):
+        """计算健康分数
+
+        windows 为学习数据中的 health_windows (v2 LearningDatabase 维护的
+        时间衰减计数) 时按滑动窗口计算；窗口内没有事件时退回累计指标。
+        """
         success = metrics.get("success_rate", 0.5)
         errors = metrics.get("total_tasks", 1)
         
+        if windows:
+            counters = DecayingCounters(windows)
+            recent_errors = counters.value("errors", window, now)
+            recent_success = counters.value("successes", window, now)
+            if recent_errors + recent_success >= 0.01:
+                success = recent_success / (recent_errors + recent_success)
+                errors = recent_errors
+        
         # 健康分数 = 成功率 - 错误率惩罚
         health = success * 100
         
@@ -309,12 +389,7 @@ OpenClaw Self-Evolution Report
 """
         
         # 错误模式统计
-        error_counts = {}
-        for error in learning_data.data.get("error_patterns", []):
-            for p in error.get("patterns", []):
-                error_counts[p] = error_counts.get(p, 0) + 1
-        
-        for error_type, count in sorted(error_counts.items(), key=lambda x: x[1], reverse=True):
+        for error_type, count in learning_data.error_type_counts():
             report += f"  - {error_type}: {count} 次\n"
         
         report += f"""
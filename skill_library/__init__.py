@@ -236,10 +236,13 @@ class TavilyModule:
 
 
 class SelfEvolvingModule:
-    """Self-Evolving 模块封装"""
+    """Self-Evolving 模块封装
+
+    默认开启 LearningDatabase 的后台写入，on_error / on_success 不再等待磁盘 I/O。
+    """
     
-    def __init__(self):
-        self.db = LearningDatabase()
+    def __init__(self, write_behind=True):
+        self.db = LearningDatabase(write_behind=write_behind)
         self.healer = SelfHealingLoop(self.db)
     
     def on_error(self, error_msg, context=None):
@@ -251,6 +254,10 @@ class SelfEvolvingModule:
         """记录成功"""
         self.healer.on_success(action, result)
     
+    def flush(self):
+        """把排队中的学习数据 (以及修复注册表、日志模板) 写盘"""
+        self.db.flush()
+    
     def run_self_inspection(self):
         """运行自检"""
         health = PerformanceMonitor.get_health_score(self.db)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+启动步骤依赖图执行器 - AutoStart 与 auto_start_sequence 共用
+
+每个步骤声明依赖的步骤名，没有依赖关系的步骤并发执行 (每步一个守护线程)，
+依赖全部结束 (成功、失败或超时) 后才启动下游步骤，下游按 deps 顺序收到
+各依赖的返回值 (失败 / 超时时为 None)。
+
+单步超时后不再等待它 (线程无法强杀，守护线程会在进程退出时一起结束)，
+记为 timeout，它之后才返回的结果会被丢弃。
+"""
+
+import time
+import queue
+import threading
+
+
+class Step:
+    """一个启动步骤：名称、可调用对象、依赖的步骤名、超时 (秒，None 为不限)"""
+
+    def __init__(self, name, func, deps=(), timeout=None):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.timeout = timeout
+
+
+def _call(step, args, done):
+    started = time.monotonic()
+    cpu_started = time.thread_time()
+    try:
+        value = step.func(*args)
+        status, error = "ok", None
+    except Exception as e:
+        value, status, error = None, "error", str(e)
+    done.put((step.name, status, value, error, time.monotonic() - started, time.thread_time() - cpu_started))
+
+
+def run_steps(steps, log=print):
+    """按依赖关系并发执行 steps
+
+    返回 {步骤名: {"status": ok|error|timeout, "value", "error", "elapsed", "cpu"}}，
+    顺序为完成顺序。cpu 为步骤线程自身的 CPU 时间 (超时的步骤为 None)。
+    依赖不存在或有环时抛出 ValueError。
+    """
+    names = {step.name for step in steps}
+    for step in steps:
+        missing = [d for d in step.deps if d not in names]
+        if missing:
+            raise ValueError(f"步骤 {step.name} 依赖不存在的步骤: {missing}")
+
+    pending = {step.name: step for step in steps}
+    running = {}
+    results = {}
+    done = queue.Queue()
+
+    while pending or running:
+        for name, step in list(pending.items()):
+            if all(d in results for d in step.deps):
+                del pending[name]
+                args = [results[d]["value"] for d in step.deps]
+                running[name] = (step, time.monotonic())
+                threading.Thread(target=_call, args=(step, args, done), name=f"step:{name}", daemon=True).start()
+        if not running:
+            raise ValueError(f"步骤依赖存在环: {sorted(pending)}")
+
+        # 等到有步骤完成，或最近的一个超时点
+        now = time.monotonic()
+        remaining = [started + step.timeout - now for step, started in running.values() if step.timeout]
+        try:
+            name, status, value, error, elapsed, cpu = done.get(timeout=max(0, min(remaining)) if remaining else None)
+            if name in running:
+                del running[name]
+                results[name] = {"status": status, "value": value, "error": error, "elapsed": elapsed, "cpu": cpu}
+                if status == "error" and log:
+                    log(f"  [FAIL] 步骤 {name} 异常: {error}")
+        except queue.Empty:
+            pass
+
+        now = time.monotonic()
+        for name, (step, started) in list(running.items()):
+            if step.timeout and now - started >= step.timeout:
+                del running[name]
+                results[name] = {"status": "timeout", "value": None,
+                                 "error": f"超过 {step.timeout} 秒", "elapsed": now - started, "cpu": None}
+                if log:
+                    log(f"  [FAIL] 步骤 {name} 超时 ({step.timeout} 秒)，不再等待")
+
+    return results
+
+
+def summarize(results):
+    """{步骤名: {"status", "elapsed"}}，用于写入结果 / 日志"""
+    return {name: {"status": r["status"], "elapsed": round(r["elapsed"], 3)} for name, r in results.items()}